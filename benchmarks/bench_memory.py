@@ -0,0 +1,116 @@
+# bench_memory.py
+# Peak memory of one scheduler cycle against the number of feeds fetched at
+# once. Every level runs in a fresh interpreter (ru_maxrss only ever grows)
+# with every feed due immediately and MAX_CONCURRENT_FETCHES set to the level,
+# so that many large documents are in flight together. Reports the peak RSS
+# of the scheduler process and of its largest parser process. --retain-parsed
+# adds a comparison run that parses the same feeds in threads and keeps every
+# full feedparser result alive until all of them are done.
+#
+# Example: python benchmarks/bench_memory.py --levels 10,50,200 --items 100 --item-bytes 4000
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+from fake_servers import start_fake_servers
+
+# Runs in a fresh interpreter; prints one JSON line.
+SCHEDULER_CHILD = r"""
+import json, resource, sys, threading, time
+sys.path.insert(0, sys.argv[1])
+sys.path.insert(0, sys.argv[2])
+base_url, feeds, duration, parse_workers = sys.argv[3], int(sys.argv[4]), float(sys.argv[5]), int(sys.argv[6])
+import scheduler
+from bench_scheduler import write_config
+scheduler.STARTUP_SPREAD = 0
+scheduler.MAX_CONCURRENT_FETCHES = feeds
+scheduler.PARSE_WORKERS = parse_workers
+scheduler.METRICS_PORT = None
+scheduler.initialize_files()
+class Args:
+    subscriptions, webhooks, interval = 1, 10, 3600
+Args.feeds = feeds
+write_config(base_url, Args)
+feed_scheduler = scheduler.FeedScheduler()
+thread = threading.Thread(target=feed_scheduler.run, daemon=True)
+thread.start()
+time.sleep(duration)
+feed_scheduler.stop()
+thread.join(timeout=30)
+print(json.dumps({
+    "checked": sum(1 for state in scheduler.get_feed_state_store().get_all().values() if state.get('last_checked')),
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "parser_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+}))
+"""
+
+RETAIN_CHILD = r"""
+import json, resource, sys
+from concurrent.futures import ThreadPoolExecutor
+import feedparser, requests
+base_url, feeds = sys.argv[3], int(sys.argv[4])
+def fetch_and_parse(feed):
+    return feedparser.parse(requests.get(f"{base_url}/feed/{feed}", timeout=60).content)
+with ThreadPoolExecutor(max_workers=feeds) as pool:
+    results = list(pool.map(fetch_and_parse, range(feeds)))
+print(json.dumps({
+    "checked": len(results),
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "parser_peak_rss_mb": 0,
+}))
+"""
+
+
+def run_child(code, base_url, feeds, args):
+    workdir = tempfile.mkdtemp(prefix="rss-memory-")
+    output = subprocess.run(
+        [sys.executable, "-c", code, REPO_DIR, BENCH_DIR, base_url, str(feeds), str(args.duration), str(args.parse_workers)],
+        cwd=workdir, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of a scheduler cycle against the number of concurrent feeds.")
+    parser.add_argument("--levels", default="10,50,200", help="comma-separated numbers of feeds fetched at once")
+    parser.add_argument("--items", type=int, default=100, help="items per feed document")
+    parser.add_argument("--item-bytes", type=int, default=4000, help="description size per item")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds each scheduler run lasts")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                        help="overrides scheduler.PARSE_WORKERS (0 parses in threads)")
+    parser.add_argument("--retain-parsed", action="store_true",
+                        help="also measure holding every full feedparser result at once")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    server_process, base_url = start_fake_servers(max(levels), args.items, args.item_bytes, change_interval=3600)
+    rows = []
+    try:
+        for feeds in levels:
+            rows.append(dict(run_child(SCHEDULER_CHILD, base_url, feeds, args), mode="scheduler", feeds=feeds))
+            if args.retain_parsed:
+                rows.append(dict(run_child(RETAIN_CHILD, base_url, feeds, args), mode="retain-parsed", feeds=feeds))
+    finally:
+        server_process.terminate()
+
+    document_kb = round(args.items * (args.item_bytes + 200) / 1024)
+    if args.json:
+        print(json.dumps({"document_kb": document_kb, "runs": rows}, indent=2))
+        return
+    print(f"~{document_kb} KB per feed document, {args.items} items")
+    print(f"{'mode':>14} {'feeds':>6} {'checked':>8} {'peak_rss_mb':>12} {'parser_peak_mb':>15}")
+    for row in rows:
+        print(f"{row['mode']:>14} {row['feeds']:>6} {row['checked']:>8} {row['peak_rss_mb']:>12.1f} {row['parser_peak_rss_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# bench_scheduler.py
+# Offline throughput benchmark for scheduler.py.
+# Starts local fake feed/webhook servers, runs the scheduler against them in a
+# scratch directory and reports feeds/sec, publish-to-post latency, CPU, memory
+# and lock wait.
+#
+# Example: python benchmarks/bench_scheduler.py --feeds 2000 --duration 120 --change-interval 30
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_servers import start_fake_servers
+from metrics import STATE_WRITE_SECONDS
+
+
+class TimedLock:
+    """Drop-in replacement for threading.Lock that records time spent waiting to acquire it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.wait_time = 0.0
+        self.acquisitions = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        started = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self.wait_time += waited
+            self.acquisitions += 1
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def write_config(base_url, args):
+    feeds = []
+    for feed in range(args.feeds):
+        for subscription in range(args.subscriptions):
+            feeds.append({
+                "id": f"bench-{feed}-{subscription}",
+                "name": f"Benchmark {feed}/{subscription}",
+                "url": f"{base_url}/feed/{feed}",
+                "webhook_url": f"{base_url}/webhook/{(feed * args.subscriptions + subscription) % args.webhooks}",
+                "update_interval": args.interval,
+                "digest": getattr(args, 'digest', None),
+                "digest_window": getattr(args, 'digest_window', 300),
+            })
+    with open("config.json", "w") as f:
+        json.dump({"FEEDS": feeds}, f)
+    return feeds
+
+
+def run_scheduler(scheduler_module, args):
+    feed_scheduler = scheduler_module.FeedScheduler()
+    thread = threading.Thread(target=feed_scheduler.run, daemon=True)
+    thread.start()
+    time.sleep(args.duration)
+    feed_scheduler.stop()
+    thread.join(timeout=30) # The loop exits at its next wake-up and shuts the parser pool down.
+
+
+def run_check_single_feed(scheduler_module, feeds, args):
+    """Calls check_single_feed directly, one feed after another, for the whole duration."""
+    feed_scheduler = scheduler_module.FeedScheduler()
+    deadline = time.time() + args.duration
+    state = {}
+    while time.time() < deadline:
+        for feed_config in feeds:
+            if time.time() >= deadline:
+                break
+            previous = state.get(feed_config['id'])
+            state[feed_config['id']] = feed_scheduler.check_single_feed(feed_config, initial_check=previous is None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for scheduler.py.")
+    parser.add_argument("--feeds", type=int, default=500, help="number of synthetic feed URLs")
+    parser.add_argument("--subscriptions", type=int, default=1, help="config entries (webhooks) per feed URL")
+    parser.add_argument("--webhooks", type=int, default=50, help="number of distinct webhook URLs")
+    parser.add_argument("--items", type=int, default=20, help="items per feed document")
+    parser.add_argument("--item-bytes", type=int, default=300, help="description size per item")
+    parser.add_argument("--change-interval", type=float, default=60.0, help="seconds between new items per feed")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the feed server waits before responding")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="fraction of webhook posts answered with 429")
+    parser.add_argument("--interval", type=int, default=30, help="update_interval for every feed, in seconds")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--startup-spread", type=float, default=5.0, help="overrides scheduler.STARTUP_SPREAD")
+    parser.add_argument("--parse-workers", type=int, default=None, help="overrides scheduler.PARSE_WORKERS (0 parses in threads)")
+    parser.add_argument("--digest", choices=["embeds", "summary"], default=None, help="digest mode for every feed")
+    parser.add_argument("--digest-window", type=int, default=60, help="digest_window for every feed, in seconds")
+    parser.add_argument("--mode", choices=["scheduler", "check"], default="scheduler",
+                        help="run the full FeedScheduler loop, or call check_single_feed sequentially")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    server_process, base_url = start_fake_servers(
+        args.feeds, args.items, args.item_bytes, args.change_interval, args.latency, args.rate_limit_ratio,
+    )
+
+    workdir = tempfile.mkdtemp(prefix="rss-bench-")
+    os.chdir(workdir)
+    import scheduler
+    scheduler.STARTUP_SPREAD = args.startup_spread
+    if args.parse_workers is not None:
+        scheduler.PARSE_WORKERS = args.parse_workers
+    scheduler.initialize_files()
+    feeds = write_config(base_url, args)
+    sent_store = scheduler.get_sent_store()
+    sent_store._lock = TimedLock()
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.time()
+    if args.mode == "scheduler":
+        run_scheduler(scheduler, args)
+    else:
+        run_check_single_feed(scheduler, feeds, args)
+    scheduler.webhook_dispatcher.wait_until_idle(timeout=10)
+    elapsed = time.time() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    # Parser processes have been reaped by now; the fake server hasn't, so it isn't counted.
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        stats = json.load(response)
+    server_process.terminate()
+
+    latencies = stats.pop("latencies")
+    cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    parser_cpu_seconds = ((children_after.ru_utime - children_before.ru_utime)
+                          + (children_after.ru_stime - children_before.ru_stime))
+    report = {
+        "mode": args.mode,
+        "feeds": args.feeds,
+        "subscriptions": len(feeds),
+        "elapsed_s": round(elapsed, 2),
+        "feeds_per_s": round(stats["feed_requests"] / elapsed, 2),
+        "publish_to_post_p50_s": percentile(latencies, 0.50),
+        "publish_to_post_p99_s": percentile(latencies, 0.99),
+        "measured_posts": len(latencies),
+        "cpu_s": round(cpu_seconds, 2),
+        "cpu_pct": round(100 * cpu_seconds / elapsed, 1),
+        "parser_cpu_s": round(parser_cpu_seconds, 2),
+        "peak_rss_mb": round(usage_after.ru_maxrss / 1024, 1), # ru_maxrss is KiB on Linux
+        "feed_state_write_s": round(STATE_WRITE_SECONDS.totals()[1], 4),
+        "dedup_lock_wait_s": round(sent_store._lock.wait_time, 4),
+        "workdir": workdir,
+    }
+    report.update(stats)
+    report["posts_per_webhook_request"] = round(stats["posts"] / max(1, stats["webhook_requests"]), 2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            if isinstance(value, float) and key.startswith("publish_to_post"):
+                value = f"{value:.3f}"
+            print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
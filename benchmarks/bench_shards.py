@@ -0,0 +1,119 @@
+# bench_shards.py
+# Local test of scheduler sharding: runs several scheduler.py instances with
+# SHARDING enabled against the fake feed/webhook server in one scratch
+# directory, kills one without warning part-way through and starts a new
+# one later, then reports how the checks were split and whether any item
+# was posted twice.
+#
+# Example: python benchmarks/bench_shards.py --instances 3 --feeds 300 --duration 120
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_servers import start_fake_servers
+from bench_scheduler import write_config
+
+
+def run_instance(workdir, name, startup_spread, parse_workers):
+    """Body of one scheduler process; its output goes to <name>.log in the scratch directory."""
+    os.setpgrp() # Own process group, so a simulated crash takes the parser processes down too.
+    os.chdir(workdir)
+    sys.stdout = sys.stderr = open(f"{name}.log", "w", buffering=1)
+    import scheduler
+    scheduler.SHARDING = True
+    scheduler.METRICS_PORT = None
+    scheduler.STARTUP_SPREAD = startup_spread
+    scheduler.PARSE_WORKERS = parse_workers
+    scheduler.get_sent_store()
+    feed_scheduler = scheduler.FeedScheduler()
+    signal.signal(signal.SIGTERM, lambda signum, frame: feed_scheduler.stop())
+    feed_scheduler.run()
+
+
+def start_instance(context, workdir, name, args):
+    process = context.Process(target=run_instance, args=(workdir, name, args.startup_spread, args.parse_workers), name=name)
+    process.start()
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs several sharded scheduler instances and checks for duplicate posts.")
+    parser.add_argument("--instances", type=int, default=3, help="scheduler processes to start")
+    parser.add_argument("--feeds", type=int, default=300, help="number of synthetic feed URLs")
+    parser.add_argument("--subscriptions", type=int, default=1, help="config entries (webhooks) per feed URL")
+    parser.add_argument("--webhooks", type=int, default=50, help="number of distinct webhook URLs")
+    parser.add_argument("--items", type=int, default=20, help="items per feed document")
+    parser.add_argument("--item-bytes", type=int, default=300, help="description size per item")
+    parser.add_argument("--change-interval", type=float, default=20.0, help="seconds between new items per feed")
+    parser.add_argument("--interval", type=int, default=10, help="update_interval for every feed, in seconds")
+    parser.add_argument("--duration", type=float, default=120.0, help="seconds to run")
+    parser.add_argument("--kill-after", type=float, default=40.0, help="SIGKILL the first instance after this many seconds (0 to skip)")
+    parser.add_argument("--join-after", type=float, default=70.0, help="start one more instance after this many seconds (0 to skip)")
+    parser.add_argument("--startup-spread", type=float, default=5.0, help="overrides scheduler.STARTUP_SPREAD")
+    parser.add_argument("--parse-workers", type=int, default=1, help="parser processes per instance")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    server_process, base_url = start_fake_servers(args.feeds, args.items, args.item_bytes, args.change_interval)
+    workdir = tempfile.mkdtemp(prefix="rss-shards-")
+    os.chdir(workdir)
+    write_config(base_url, args)
+    # Create the shared databases up front instead of racing to create them.
+    import dedup_store
+    import state_store
+    state_store.FeedStateStore()
+    dedup_store.open_dedup_store().close()
+
+    context = multiprocessing.get_context("spawn")
+    instances = {f"instance-{i}": start_instance(context, workdir, f"instance-{i}", args) for i in range(args.instances)}
+    events = [(args.kill_after, "kill"), (args.join_after, "join")]
+    started = time.time()
+    for at, event in sorted(events):
+        if not at or at >= args.duration:
+            continue
+        time.sleep(max(0, started + at - time.time()))
+        if event == "kill":
+            print(f"{at:.0f}s: killing instance-0")
+            os.killpg(instances["instance-0"].pid, signal.SIGKILL)
+        else:
+            name = f"instance-{len(instances)}"
+            print(f"{at:.0f}s: starting {name}")
+            instances[name] = start_instance(context, workdir, name, args)
+    time.sleep(max(0, started + args.duration - time.time()))
+
+    for process in instances.values():
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+    for process in instances.values():
+        process.join(timeout=30)
+
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        stats = json.load(response)
+    server_process.terminate()
+    stats.pop("latencies")
+
+    checks = {}
+    for name in instances:
+        with open(os.path.join(workdir, f"{name}.log")) as f:
+            checks[name] = sum(1 for line in f if line.startswith("Processing feed:"))
+    report = {"instances": len(instances), "feeds": args.feeds, "checks_per_instance": checks, "workdir": workdir}
+    report.update(stats)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>20}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench_web_startup.py
+# Measures web worker cold start: importing main_web, building the app with
+# create_app(), and the first and a warm request to the feed list. Every run
+# is a fresh interpreter in one scratch directory with a synthetic config and
+# feed state. Also measures a --preload style worker: the app is built once,
+# then a forked child serves its first request with the parent's caches.
+#
+# Example: python benchmarks/bench_web_startup.py --runs 10 --feeds 2000
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# Runs in a fresh interpreter; prints one JSON line of timings in seconds.
+CHILD = r"""
+import json, os, resource, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main_web
+imported = time.perf_counter()
+app = main_web.create_app()
+created = time.perf_counter()
+
+def timed_get(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    started = time.perf_counter()
+    response = client.get('/')
+    assert response.status_code == 200, response.status_code
+    return time.perf_counter() - started
+
+first_request = timed_get(app)
+warm_request = timed_get(app)
+
+read_fd, write_fd = os.pipe()
+pid = os.fork()
+if pid == 0:
+    os.write(write_fd, str(timed_get(app)).encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+forked_first_request = float(os.read(read_fd, 64))
+
+print(json.dumps({
+    "import_s": imported - started,
+    "create_app_s": created - imported,
+    "first_request_s": first_request,
+    "warm_request_s": warm_request,
+    "forked_first_request_s": forked_first_request,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def prepare_workdir(feeds):
+    workdir = tempfile.mkdtemp(prefix="rss-web-startup-")
+    os.chdir(workdir)
+    config = {"FEEDS": [
+        {"id": f"feed-{i}", "name": f"Feed {i}", "url": f"https://example.com/feed/{i}",
+         "webhook_url": f"https://discord.com/api/webhooks/{i % 50}/token", "update_interval": 300}
+        for i in range(feeds)
+    ]}
+    with open("config.json", "w") as f:
+        json.dump(config, f)
+    with open("user.json", "w") as f:
+        json.dump({"id": 1, "username": "admin", "password": "unused"}, f)
+    import state_store
+    state_store.FeedStateStore().upsert_many({
+        f"feed-{i}": {"status_code": 200, "last_checked": "2024-01-01T00:00:00+00:00", "newest_entry_id": f"item-{i}"}
+        for i in range(feeds)
+    })
+    return workdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures main_web import, app creation and first-request latency.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--feeds", type=int, default=500, help="feeds in the synthetic config")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir(args.feeds)
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-c", CHILD, REPO_DIR], cwd=workdir, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    report = {"runs": args.runs, "feeds": args.feeds}
+    for key in runs[0]:
+        report[key] = round(statistics.median(run[key] for run in runs), 4)
+    report["workdir"] = workdir
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# fake_servers.py
+# Local stand-ins for RSS feeds and Discord webhooks, used by the benchmarks.
+# Runs in its own process so the scheduler's CPU and memory can be measured separately.
+
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FEED_PATH = re.compile(r"^/feed/(\d+)$")
+ITEM_LINK = re.compile(r"/feed/(\d+)/item/(-?\d+)$")
+
+
+class FeedWorld:
+    """
+    Deterministic publishing schedule: feed i publishes item k at
+    start + offset_i + k * change_interval. Items with k <= 0 existed before the run.
+    """
+
+    def __init__(self, feeds, items, item_bytes, change_interval, start):
+        self.feeds = feeds
+        self.items = items
+        self.item_bytes = item_bytes
+        self.change_interval = change_interval
+        self.start = start
+        rng = random.Random(42)
+        self.offsets = [rng.uniform(0, change_interval) for _ in range(feeds)]
+
+    def latest_item(self, feed, now):
+        return int((now - self.start - self.offsets[feed]) // self.change_interval)
+
+    def published_at(self, feed, item):
+        return self.start + self.offsets[feed] + item * self.change_interval
+
+    def render(self, feed, base_url, latest):
+        filler = ("lorem ipsum " * (self.item_bytes // 12 + 1))[:self.item_bytes]
+        items = []
+        for item in range(latest, latest - self.items, -1):
+            link = f"{base_url}/feed/{feed}/item/{item}"
+            items.append(
+                f"<item><title>Feed {feed} item {item}</title><link>{link}</link>"
+                f"<guid>{link}</guid><pubDate>{formatdate(self.published_at(feed, item))}</pubDate>"
+                f"<description>{filler}</description></item>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>Benchmark feed {feed}</title><link>{base_url}/feed/{feed}</link>"
+            f"<description>Synthetic feed</description>{''.join(items)}</channel></rss>"
+        ).encode("utf-8")
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.feed_requests = 0
+        self.not_modified = 0
+        self.webhook_requests = 0
+        self.rate_limited = 0
+        self.posts = 0
+        self.posted = {} # (webhook path, item link) -> times posted
+        self.latencies = [] # publish -> post, seconds, for items published during the run
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "feed_requests": self.feed_requests,
+                "not_modified": self.not_modified,
+                "webhook_requests": self.webhook_requests,
+                "rate_limited": self.rate_limited,
+                "posts": self.posts,
+                "duplicate_posts": sum(count - 1 for count in self.posted.values()),
+                "latencies": list(self.latencies),
+            }
+
+
+def make_handler(world, stats, latency, rate_limit_ratio):
+    rng = random.Random(7)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, json.dumps(stats.as_dict()).encode(), {"Content-Type": "application/json"})
+                return
+            match = FEED_PATH.match(self.path)
+            if not match or int(match.group(1)) >= world.feeds:
+                self._send(404)
+                return
+            if latency:
+                time.sleep(latency)
+            feed = int(match.group(1))
+            latest = world.latest_item(feed, time.time())
+            etag = f'"{feed}-{latest}"'
+            with stats.lock:
+                stats.feed_requests += 1
+            if self.headers.get("If-None-Match") == etag:
+                with stats.lock:
+                    stats.not_modified += 1
+                self._send(304, headers={"ETag": etag})
+                return
+            base_url = f"http://{self.headers.get('Host')}"
+            body = world.render(feed, base_url, latest)
+            self._send(200, body, {"Content-Type": "application/rss+xml", "ETag": etag})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            received = time.time()
+            with stats.lock:
+                stats.webhook_requests += 1
+                limited = rng.random() < rate_limit_ratio
+                if limited:
+                    stats.rate_limited += 1
+            if limited:
+                body = json.dumps({"message": "You are being rate limited.", "retry_after": 0.2, "global": False}).encode()
+                self._send(429, body, {"Content-Type": "application/json", "Retry-After": "1", "X-RateLimit-Remaining": "0"})
+                return
+            with stats.lock:
+                for embed in payload.get("embeds", []):
+                    stats.posts += 1
+                    posted_key = (self.path, embed.get("url", ""))
+                    stats.posted[posted_key] = stats.posted.get(posted_key, 0) + 1
+                    match = ITEM_LINK.search(embed.get("url", ""))
+                    if match and int(match.group(2)) > 0:
+                        stats.latencies.append(received - world.published_at(int(match.group(1)), int(match.group(2))))
+            self._send(204, headers={"X-RateLimit-Limit": "5", "X-RateLimit-Remaining": "4", "X-RateLimit-Reset-After": "1"})
+
+    return Handler
+
+
+def _serve(port_queue, feeds, items, item_bytes, change_interval, latency, rate_limit_ratio, start):
+    world = FeedWorld(feeds, items, item_bytes, change_interval, start)
+    stats = Stats()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(world, stats, latency, rate_limit_ratio))
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_fake_servers(feeds, items=20, item_bytes=300, change_interval=60.0, latency=0.0, rate_limit_ratio=0.0, start=None):
+    """Starts the feed and webhook server in a child process. Returns (process, base_url)."""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve,
+        args=(port_queue, feeds, items, item_bytes, change_interval, latency, rate_limit_ratio, start or time.time()),
+        daemon=True,
+    )
+    process.start()
+    port = port_queue.get(timeout=10)
+    return process, f"http://127.0.0.1:{port}"
@@ -0,0 +1,265 @@
+# bulk_import.py
+# Bulk feed import for the web UI. Reads OPML or JSON exports, validates
+# every feed URL concurrently with a bounded thread pool, and pre-seeds the
+# feed state and dedup history of the feeds that pass, so the scheduler
+# polls them normally (spread over their interval) instead of running
+# hundreds of initial checks at once. Progress is written to a small JSON
+# file per job so any web worker process can show it.
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from dedup_store import seed_sent_articles
+from state_store import get_feed_state_store
+
+# --- Configuration ---
+IMPORT_DIR = "imports" # Progress files, one per import job.
+IMPORT_WORKERS = 16 # Feeds validated at the same time.
+MAX_IMPORT_ROWS = 5000
+PROGRESS_WRITE_INTERVAL = 1.0 # Seconds between progress file updates.
+
+
+# --- Parsing Import Files ---
+
+def parse_opml(content):
+    """Returns [{"url", "name"}] for every outline with an xmlUrl, including nested folders."""
+    root = ElementTree.fromstring(content)
+    rows = []
+    for outline in root.iter('outline'):
+        url = (outline.get('xmlUrl') or '').strip()
+        if url:
+            rows.append({"url": url, "name": outline.get('title') or outline.get('text') or ''})
+    return rows
+
+
+def parse_json_import(content):
+    """Accepts a config.json backup ({"FEEDS": [...]}) or a plain list of feeds or URLs."""
+    data = json.loads(content)
+    if isinstance(data, dict):
+        data = data.get('FEEDS', [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of feeds or a config.json backup.")
+    rows = []
+    for item in data:
+        if isinstance(item, str):
+            item = {"url": item}
+        if isinstance(item, dict) and item.get('url'):
+            rows.append(item)
+    return rows
+
+
+def parse_import_file(filename, content):
+    if filename.lower().endswith('.json'):
+        return parse_json_import(content)
+    return parse_opml(content)
+
+
+# --- Validation ---
+
+def validate_feed(url):
+    """
+    Downloads and parses a feed. Returns (error, seed), where seed holds the
+    validators, newest entry and entry IDs used to pre-seed the feed.
+    """
+    # Only needed here; importing them lazily keeps feedparser and requests out of the web app's startup.
+    import requests
+    from feed_parser import newest_first, parse_feed
+    from fetch import FeedTooLarge, download_feed
+    try:
+        content, status_code, headers = download_feed(url)
+    except FeedTooLarge:
+        return "Feed is too large", None
+    except requests.RequestException as e:
+        return f"Could not fetch: {e.__class__.__name__}", None
+    if status_code >= 400:
+        return f"HTTP {status_code}", None
+
+    response_headers = dict(headers)
+    response_headers.setdefault('content-location', url) # As the scheduler does, so relative IDs resolve the same way.
+    feed_data = parse_feed(content, response_headers)
+    if not feed_data.entries and feed_data.bozo:
+        return "Not a valid RSS/Atom feed", None
+
+    entries = newest_first(feed_data.entries) # As the scheduler scans them; the first is its high-water mark.
+    published_times = [entry.published for entry in entries if entry.published]
+    return None, {
+        "status_code": 200,
+        "fetched_url": url,
+        "etag": headers.get('etag'),
+        "last_modified": headers.get('last-modified'),
+        "content_hash": hashlib.sha256(content).hexdigest(),
+        "newest_entry_id": entries[0].id if entries else None,
+        "newest_entry_time": max(published_times) if published_times else None,
+        "entry_ids": [entry.id for entry in entries if entry.id],
+        "title": feed_data.title,
+    }
+
+
+# --- Import Jobs ---
+
+def progress_path(job_id):
+    return os.path.join(IMPORT_DIR, f"{job_id}.json")
+
+
+def load_progress(job_id):
+    """The latest progress of an import job, or None for an unknown job."""
+    if not all(c in '0123456789abcdef-' for c in job_id):
+        return None
+    try:
+        with open(progress_path(job_id), 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+class ImportJob:
+    """
+    Validates rows in the background and merges the valid ones into the
+    config through `merge_feeds`, a callable that receives the new feed
+    dicts and returns how many it added.
+    """
+
+    def __init__(self, filename, rows, defaults, existing_feeds, merge_feeds):
+        self.id = str(uuid.uuid4())
+        self.merge_feeds = merge_feeds
+        self.defaults = defaults
+        self._lock = threading.Lock()
+        self._last_write = 0
+        self.progress = {
+            "id": self.id, "filename": filename, "total": 0, "done": 0,
+            "added": 0, "skipped": 0, "failed": 0, "finished": False, "rows": [],
+        }
+        existing = {(feed['url'].strip(), feed['webhook_url']) for feed in existing_feeds}
+        imported = set()
+        self.pending = []
+        for row in rows[:MAX_IMPORT_ROWS]:
+            feed = self.feed_from_row(row)
+            result = {"url": feed['url'], "name": feed['name'], "result": "pending", "detail": ""}
+            if not feed['url'].startswith(('http://', 'https://')):
+                result.update(result="failed", detail="Not an http(s) URL")
+            elif not feed['webhook_url']:
+                result.update(result="failed", detail="No webhook URL")
+            elif (feed['url'], feed['webhook_url']) in existing:
+                result.update(result="skipped", detail="Already configured")
+            elif (feed['url'], feed['webhook_url']) in imported:
+                result.update(result="skipped", detail="Listed twice in the file")
+            else:
+                imported.add((feed['url'], feed['webhook_url']))
+                self.pending.append((len(self.progress['rows']), feed))
+            self.progress['rows'].append(result)
+        self.progress['total'] = len(self.progress['rows'])
+        for result in self.progress['rows']:
+            if result['result'] in ('failed', 'skipped'):
+                self.progress[result['result']] += 1
+                self.progress['done'] += 1
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        self.write_progress(force=True)
+
+    def feed_from_row(self, row):
+        def number(key):
+            try:
+                return int(row.get(key) or self.defaults[key])
+            except (TypeError, ValueError):
+                return self.defaults[key]
+        update_interval = max(60, number('update_interval'))
+        return {
+            "id": str(uuid.uuid4()),
+            "name": str(row.get('name') or ''),
+            "url": str(row['url']).strip(),
+            "webhook_url": str(row.get('webhook_url') or self.defaults['webhook_url']).strip(),
+            "update_interval": update_interval,
+            "adaptive": bool(row.get('adaptive', self.defaults['adaptive'])),
+            "suppress_duplicates": bool(row.get('suppress_duplicates', self.defaults.get('suppress_duplicates', False))),
+            "digest": row['digest'] if row.get('digest') in ("embeds", "summary") else self.defaults.get('digest'),
+            "digest_window": max(60, number('digest_window')),
+            "min_interval": number('min_interval'),
+            "max_interval": max(number('min_interval'), number('max_interval')),
+        }
+
+    def start(self):
+        threading.Thread(target=self.run, name=f"import-{self.id[:8]}", daemon=True).start()
+
+    def write_progress(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_write < PROGRESS_WRITE_INTERVAL:
+                return
+            self._last_write = now
+            tmp_path = progress_path(self.id) + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.progress, f)
+            os.replace(tmp_path, progress_path(self.id))
+
+    def run(self):
+        valid = [] # (feed, seed)
+        urls = {feed['url'] for _, feed in self.pending}
+        with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+            # Each URL is fetched once, however many webhooks it is imported for.
+            futures = {pool.submit(validate_feed, url): url for url in urls}
+            by_url = {}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    by_url[url] = future.result()
+                except Exception as e:
+                    by_url[url] = (f"Error: {e}", None)
+                for index, feed in self.pending:
+                    if feed['url'] != url:
+                        continue
+                    error, seed = by_url[url]
+                    with self._lock:
+                        result = self.progress['rows'][index]
+                        if error:
+                            result.update(result="failed", detail=error)
+                            self.progress['failed'] += 1
+                        else:
+                            result.update(result="valid", detail=seed['title'])
+                            if not feed['name']:
+                                feed['name'] = seed['title']
+                            valid.append((feed, seed))
+                        self.progress['done'] += 1
+                self.write_progress()
+
+        try:
+            self.seed(valid)
+            added = self.merge_feeds([feed for feed, _ in valid])
+        except Exception as e:
+            print(f"Bulk import {self.id} failed while saving: {e}")
+            with self._lock:
+                self.progress['error'] = str(e)
+                added = 0
+        with self._lock:
+            self.progress['added'] = added
+            self.progress['finished'] = True
+            for result in self.progress['rows']:
+                if result['result'] == "valid":
+                    result['result'] = "added"
+        self.write_progress(force=True)
+
+    def seed(self, valid):
+        """
+        Records each feed as freshly checked, with its current entries already
+        seen. last_checked is spread over the past interval, so first polls
+        are staggered rather than all due at once.
+        """
+        now = time.time()
+        states = {}
+        sent_records = []
+        for feed, seed in valid:
+            offset = random.uniform(0, feed['update_interval'])
+            checked_at = datetime.fromtimestamp(now - offset, timezone.utc).isoformat()
+            state = {key: value for key, value in seed.items() if key not in ('entry_ids', 'title')}
+            state['last_checked'] = checked_at
+            states[feed['id']] = state
+            sent_records.extend((feed['id'], article_id, now) for article_id in seed['entry_ids'])
+        if not seed_sent_articles(sent_records):
+            # The dedup backend can't be written from here; let the scheduler run its initial checks instead.
+            return
+        get_feed_state_store().upsert_many(states)
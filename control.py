@@ -0,0 +1,129 @@
+# control.py
+# Local control channel between the web UI and the scheduler. Every running
+# scheduler listens on its own Unix socket in CONTROL_DIR (several may run
+# side by side when sharding); a command is one line of JSON and so is the
+# reply. The web UI uses it to have config changes applied straight away and
+# to check a feed on demand. From a shell:
+#
+#   python control.py reload
+#   python control.py check <feed_id>
+#   python control.py profile [seconds]
+#   python control.py ping
+
+import asyncio
+import glob
+import json
+import os
+import socket
+import sys
+
+# --- Configuration ---
+CONTROL_DIR = "control"
+CONTROL_TIMEOUT = 2 # Seconds the web UI waits for a scheduler to answer.
+MAX_COMMAND_BYTES = 64 * 1024
+
+
+def control_available():
+    return hasattr(socket, "AF_UNIX") # Not on Windows; the scheduler then only watches config.json.
+
+
+def socket_paths():
+    return sorted(glob.glob(os.path.join(CONTROL_DIR, "*.sock")))
+
+
+# --- Scheduler Side ---
+
+async def start_control_server(handle_command):
+    """
+    Listens for commands on a socket for this process. handle_command(command)
+    is called in the event loop and returns the reply dict. Returns
+    (server, path), or (None, None) if Unix sockets aren't available.
+    """
+    if not control_available():
+        return None, None
+    os.makedirs(CONTROL_DIR, exist_ok=True)
+    path = os.path.join(CONTROL_DIR, f"scheduler-{os.getpid()}.sock")
+    if os.path.exists(path):
+        os.remove(path) # Left behind by an earlier process with the same pid.
+
+    async def serve_client(reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), CONTROL_TIMEOUT)
+            try:
+                reply = handle_command(json.loads(line))
+            except Exception as e:
+                reply = {"ok": False, "error": repr(e)[:200]}
+            writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(serve_client, path, limit=MAX_COMMAND_BYTES)
+    return server, path
+
+
+async def stop_control_server(server, path):
+    if server is None:
+        return
+    server.close()
+    await server.wait_closed()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# --- Client Side ---
+
+def send_command(command, timeout=CONTROL_TIMEOUT, **fields):
+    """
+    Sends a command to every running scheduler. Returns their replies, which
+    is an empty list if none is running (or control isn't available here).
+    """
+    if not control_available():
+        return []
+    message = json.dumps(dict(fields, command=command)).encode("utf-8") + b"\n"
+    replies = []
+    for path in socket_paths():
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(path)
+                sock.sendall(message)
+                data = b""
+                while not data.endswith(b"\n") and len(data) < MAX_COMMAND_BYTES:
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
+            replies.append(json.loads(data))
+        except ConnectionRefusedError:
+            # Nothing listens there any more: the scheduler was killed without cleaning up.
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        except (OSError, ValueError) as e:
+            print(f"Scheduler at {path} did not answer {command!r}: {e}")
+    return replies
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python control.py reload | check <feed_id> | profile [seconds] | ping")
+        sys.exit(2)
+    command, args = sys.argv[1], sys.argv[2:]
+    fields = {}
+    if command == "check" and args:
+        fields["feed_id"] = args[0]
+    elif command == "profile" and args:
+        fields["seconds"] = float(args[0])
+    replies = send_command(command, **fields)
+    if not replies:
+        print("No scheduler is running.")
+        sys.exit(1)
+    for reply in replies:
+        print(json.dumps(reply))
+    sys.exit(0 if any(reply.get("ok") for reply in replies) else 1)
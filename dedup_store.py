@@ -0,0 +1,292 @@
+# dedup_store.py
+# Remembers which articles have already been posted, per feed.
+# Lookups are served from an in-memory index; changes are persisted
+# incrementally (SQLite rows or an append-only log) instead of rewriting a file.
+
+import os
+import json
+import sqlite3
+import threading
+import time
+import yaml
+from contextlib import contextmanager
+from metrics import DEDUP_LOCK_WAIT_SECONDS
+
+# --- Configuration ---
+DEDUP_BACKEND = "sqlite"  # "sqlite" or "log"
+SENT_ARTICLES_DB = "sent_articles.db"
+SENT_ARTICLES_LOG = "sent_articles.log"
+LEGACY_SENT_ARTICLES_FILE = "sent_articles.yaml"  # Migrated automatically on first start.
+SENT_ARTICLE_RETENTION = 7 * 24 * 3600  # Seconds an article ID is remembered.
+MAX_SENT_ARTICLES_PER_FEED = 10000  # Hard cap so a single feed can't grow without bound.
+
+# IDs imported from the old global sent_articles.yaml have no feed attached,
+# so they live in a shared bucket that is consulted for every feed until they expire.
+LEGACY_FEED_KEY = "*"
+
+
+class DedupStore:
+    """
+    Base class holding the in-memory index: {feed_id: {article_id: sent_at}}.
+    Subclasses only implement persistence.
+    """
+
+    shared = False # Whether several processes can use the same store at once.
+
+    def __init__(self, retention=SENT_ARTICLE_RETENTION, max_per_feed=MAX_SENT_ARTICLES_PER_FEED):
+        self.retention = retention
+        self.max_per_feed = max_per_feed
+        self._lock = threading.Lock()
+        self._index = {}
+
+    # --- Persistence hooks ---
+
+    def _load_records(self):
+        """Yields (feed_id, article_id, sent_at) for everything persisted."""
+        raise NotImplementedError
+
+    def _load_feed_records(self, feed_id):
+        """Yields (article_id, sent_at) persisted for one feed, including other processes' writes."""
+        raise NotImplementedError
+
+    def _persist_add(self, records):
+        raise NotImplementedError
+
+    def _persist_remove(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    @contextmanager
+    def _locked(self):
+        """Acquires the index lock, recording how long the caller waited for it."""
+        started = time.perf_counter()
+        with self._lock:
+            DEDUP_LOCK_WAIT_SECONDS.observe(time.perf_counter() - started)
+            yield
+
+    # --- Public API ---
+
+    def load(self):
+        with self._lock:
+            self._index = {}
+            for feed_id, article_id, sent_at in self._load_records():
+                self._index.setdefault(feed_id, {})[article_id] = sent_at
+        self._migrate_legacy_file()
+        self.expire()
+
+    def contains(self, feed_id, article_id):
+        with self._locked():
+            return (article_id in self._index.get(feed_id, ())
+                    or article_id in self._index.get(LEGACY_FEED_KEY, ()))
+
+    def add(self, feed_id, article_id):
+        return self.add_many(feed_id, [article_id]) == 1
+
+    def add_many(self, feed_id, article_ids, sent_at=None):
+        """Records article IDs for a feed. Returns how many were new."""
+        sent_at = sent_at or time.time()
+        with self._locked():
+            bucket = self._index.setdefault(feed_id, {})
+            new_records = []
+            for article_id in article_ids:
+                if article_id not in bucket:
+                    bucket[article_id] = sent_at
+                    new_records.append((feed_id, article_id, sent_at))
+            if new_records:
+                self._persist_add(new_records)
+                self._trim_bucket(feed_id, bucket)
+            return len(new_records)
+
+    def refresh_feed(self, feed_id):
+        """Re-reads one feed's IDs from disk, e.g. after another scheduler instance posted for it."""
+        with self._lock:
+            self._index.setdefault(feed_id, {}).update(self._load_feed_records(feed_id))
+
+    def forget_feed(self, feed_id):
+        with self._lock:
+            bucket = self._index.pop(feed_id, {})
+            if bucket:
+                self._persist_remove([(feed_id, article_id) for article_id in bucket])
+
+    def expire(self, now=None):
+        """Drops IDs older than the retention window."""
+        cutoff = (now or time.time()) - self.retention
+        with self._lock:
+            expired = []
+            for feed_id, bucket in list(self._index.items()):
+                for article_id, sent_at in list(bucket.items()):
+                    if sent_at < cutoff:
+                        del bucket[article_id]
+                        expired.append((feed_id, article_id))
+                if not bucket:
+                    del self._index[feed_id]
+            if expired:
+                self._persist_remove(expired)
+            return len(expired)
+
+    def _trim_bucket(self, feed_id, bucket):
+        # Caller holds self._lock.
+        overflow = len(bucket) - self.max_per_feed
+        if overflow <= 0:
+            return
+        oldest = sorted(bucket.items(), key=lambda item: item[1])[:overflow]
+        for article_id, _ in oldest:
+            del bucket[article_id]
+        self._persist_remove([(feed_id, article_id) for article_id, _ in oldest])
+
+    def _migrate_legacy_file(self):
+        """Imports the old global sent_articles.yaml list once, then renames it."""
+        if not os.path.exists(LEGACY_SENT_ARTICLES_FILE):
+            return
+        try:
+            with open(LEGACY_SENT_ARTICLES_FILE, 'r') as f:
+                content = f.read()
+                legacy_ids = (yaml.safe_load(content) or []) if content else []
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Could not migrate {LEGACY_SENT_ARTICLES_FILE}: {e}")
+            return
+        added = self.add_many(LEGACY_FEED_KEY, [str(article_id) for article_id in legacy_ids])
+        os.replace(LEGACY_SENT_ARTICLES_FILE, LEGACY_SENT_ARTICLES_FILE + ".migrated")
+        print(f"Migrated {added} article IDs from {LEGACY_SENT_ARTICLES_FILE}")
+
+
+class SqliteDedupStore(DedupStore):
+    """Persists each change as a single row insert/delete."""
+
+    shared = True
+
+    def __init__(self, path=SENT_ARTICLES_DB, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sent_articles ("
+            " feed_id TEXT NOT NULL,"
+            " article_id TEXT NOT NULL,"
+            " sent_at REAL NOT NULL,"
+            " PRIMARY KEY (feed_id, article_id))"
+        )
+
+    def _load_records(self):
+        return self._conn.execute("SELECT feed_id, article_id, sent_at FROM sent_articles").fetchall()
+
+    def _load_feed_records(self, feed_id):
+        return self._conn.execute("SELECT article_id, sent_at FROM sent_articles WHERE feed_id = ?", (feed_id,)).fetchall()
+
+    @contextmanager
+    def _transaction(self):
+        # The connection is in autocommit mode, so without an explicit BEGIN
+        # every row of an executemany would be committed on its own.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _persist_add(self, records):
+        with self._transaction():
+            self._conn.executemany("INSERT OR IGNORE INTO sent_articles VALUES (?, ?, ?)", records)
+
+    def _persist_remove(self, records):
+        with self._transaction():
+            self._conn.executemany("DELETE FROM sent_articles WHERE feed_id = ? AND article_id = ?", records)
+
+    def close(self):
+        self._conn.close()
+
+
+class AppendLogDedupStore(DedupStore):
+    """
+    Persists changes as JSON lines appended to a log file. The log is
+    compacted (rewritten with only live IDs) once it is mostly dead records.
+    """
+
+    def __init__(self, path=SENT_ARTICLES_LOG, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._log_records = 0
+        self._log = None
+
+    def _load_records(self):
+        live = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    self._log_records += 1
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn final line after a crash.
+                    if record[0] == "-":
+                        live.pop((record[1], record[2]), None)
+                    else:
+                        live[(record[1], record[2])] = record[3]
+        self._log = open(self.path, 'a')
+        return [(feed_id, article_id, sent_at) for (feed_id, article_id), sent_at in live.items()]
+
+    def _append(self, lines):
+        self._log.write("".join(json.dumps(line) + "\n" for line in lines))
+        self._log.flush()
+        self._log_records += len(lines)
+
+    def _persist_add(self, records):
+        self._append([["+", feed_id, article_id, sent_at] for feed_id, article_id, sent_at in records])
+
+    def _persist_remove(self, records):
+        self._append([["-", feed_id, article_id] for feed_id, article_id in records])
+        live = sum(len(bucket) for bucket in self._index.values())
+        if self._log_records > 2 * live + 1000:
+            self._compact()
+
+    def _compact(self):
+        # Caller holds self._lock.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for feed_id, bucket in self._index.items():
+                for article_id, sent_at in bucket.items():
+                    f.write(json.dumps(["+", feed_id, article_id, sent_at]) + "\n")
+        self._log.close()
+        os.replace(tmp_path, self.path)
+        self._log = open(self.path, 'a')
+        self._log_records = sum(len(bucket) for bucket in self._index.values())
+
+    def close(self):
+        if self._log:
+            self._log.close()
+
+
+DEDUP_BACKENDS = {
+    "sqlite": SqliteDedupStore,
+    "log": AppendLogDedupStore,
+}
+
+
+def open_dedup_store(backend=DEDUP_BACKEND, **kwargs):
+    """Creates the configured store and loads its index."""
+    store = DEDUP_BACKENDS[backend](**kwargs)
+    store.load()
+    return store
+
+
+def seed_sent_articles(records, backend=DEDUP_BACKEND):
+    """
+    Bulk-writes (feed_id, article_id, sent_at) records from outside the
+    scheduler (e.g. a bulk import) without loading the whole index.
+    Returns False if the backend can't be written by a second process.
+    """
+    store_class = DEDUP_BACKENDS[backend]
+    if not store_class.shared:
+        return False
+    store = store_class()
+    try:
+        if records:
+            store._persist_add(records)
+    finally:
+        store.close()
+    return True
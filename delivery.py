@@ -0,0 +1,221 @@
+# delivery.py
+# Delivers Discord webhook posts through one queue per webhook, worked by a
+# fixed pool of threads. A webhook's queue is taken by one worker at a time,
+# so posts to the same webhook stay in order, and queues are taken in turn so
+# busy channels can't starve the others. A rate-limited webhook is set aside
+# until its bucket refills instead of holding a worker, following Discord's
+# rate-limit headers instead of burning requests on 429s.
+
+import collections
+import heapq
+import itertools
+import threading
+import time
+import requests
+from metrics import WEBHOOK_SECONDS, WEBHOOK_RESPONSES, DELIVERIES
+
+# --- Delivery Settings ---
+WEBHOOK_WORKERS = 16 # Threads (and connection pools) posting to Discord, however many webhooks there are.
+WEBHOOK_CONNECT_TIMEOUT = 5 # Seconds allowed to connect to Discord.
+WEBHOOK_READ_TIMEOUT = 10 # Seconds allowed waiting for Discord's response.
+MAX_RATE_LIMIT_WAIT = 3600 # Upper bound on a single Retry-After, so a bogus value can't park a webhook for long.
+MAX_DELIVERY_ATTEMPTS = 5 # Attempts per post for network errors and 5xx responses.
+MAX_RATE_LIMIT_RETRIES = 20 # 429 responses tolerated per post before giving up.
+RETRY_BACKOFF_BASE = 2 # Seconds; doubled after every failed attempt.
+MAX_RETRY_BACKOFF = 300
+
+RATE_LIMITED = "rate limited" # _send result: put the post back and try its webhook later.
+
+
+class Delivery:
+    """
+    A single payload waiting to be posted to a webhook. `keys` identify what
+    it carries (several entries for a digest). on_failure is called with
+    (error, retryable); retryable is False when Discord rejected the post.
+    """
+
+    def __init__(self, webhook_url, payload, keys=(), on_success=None, on_failure=None):
+        self.webhook_url = webhook_url
+        self.payload = payload
+        self.keys = keys
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.rate_limited = 0 # 429 responses so far
+
+
+class WebhookDispatcher:
+    def __init__(self, workers=WEBHOOK_WORKERS):
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock) # A webhook queue became due.
+        self._idle = threading.Condition(self._lock) # A delivery finished.
+        self._max_workers = workers
+        self._workers = [] # started lazily, on the first submit
+        self._queues = {} # webhook_url -> deque of Delivery, while it has any
+        self._due = [] # heap of (time, seq, webhook_url) for queues not being worked
+        self._seq = itertools.count()
+        self._outstanding = 0 # deliveries queued or in progress
+        self._pending = set() # keys of queued or in-progress deliveries
+        self._webhook_buckets = {} # webhook_url -> Discord rate-limit bucket id
+        self._bucket_reset_at = {} # bucket id (or webhook_url) -> time the bucket refills
+        self._global_reset_at = 0
+
+    def submit(self, webhook_url, payload, keys=(), on_success=None, on_failure=None):
+        """Queues a payload for delivery. Returns False if any of its keys is already pending."""
+        keys = tuple(keys)
+        with self._lock:
+            if self._pending.intersection(keys):
+                return False
+            self._pending.update(keys)
+            self._outstanding += 1
+            if webhook_url not in self._queues:
+                self._queues[webhook_url] = collections.deque()
+                self._schedule(webhook_url, 0)
+            self._queues[webhook_url].append(Delivery(webhook_url, payload, keys, on_success, on_failure))
+            while len(self._workers) < self._max_workers:
+                worker = threading.Thread(target=self._worker, name=f"webhook-worker-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        return True
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def pending_keys(self):
+        with self._lock:
+            return set(self._pending)
+
+    def wait_until_idle(self, timeout=None):
+        """Blocks until every queued delivery has finished. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._outstanding, timeout)
+
+    def _schedule(self, webhook_url, at):
+        # Caller holds self._lock.
+        heapq.heappush(self._due, (at, next(self._seq), webhook_url))
+        self._ready.notify()
+
+    def _next_webhook(self):
+        """Waits for a webhook whose queue is due and claims it."""
+        with self._ready:
+            while True:
+                now = time.time()
+                if self._due and self._due[0][0] <= now:
+                    return heapq.heappop(self._due)[2]
+                self._ready.wait(self._due[0][0] - now if self._due else None)
+
+    def _worker(self):
+        session = requests.Session()
+        while True:
+            webhook_url = self._next_webhook()
+            with self._lock:
+                bucket = self._webhook_buckets.get(webhook_url, webhook_url)
+                reset_at = max(self._global_reset_at, self._bucket_reset_at.get(bucket, 0))
+                if reset_at > time.time():
+                    self._schedule(webhook_url, reset_at) # Rate limited; let other webhooks go first.
+                    continue
+                delivery = self._queues[webhook_url].popleft()
+
+            try:
+                delivered, error, retryable = self._send(session, delivery)
+            except Exception as e:
+                print(f"Unexpected error delivering to webhook: {e}")
+                delivered, error, retryable = False, repr(e), True
+
+            if delivered is RATE_LIMITED:
+                with self._lock:
+                    self._queues[webhook_url].appendleft(delivery) # Stays first, keeping the order.
+                    self._schedule(webhook_url, 0) # Held back above until the bucket refills.
+                continue
+
+            DELIVERIES.inc(outcome="delivered" if delivered else "failed")
+            try:
+                if delivered and delivery.on_success:
+                    delivery.on_success()
+                elif not delivered and delivery.on_failure:
+                    delivery.on_failure(error, retryable)
+            except Exception as e:
+                print(f"Error in delivery callback: {e}")
+            with self._lock:
+                self._pending.difference_update(delivery.keys)
+                self._outstanding -= 1
+                if self._queues[webhook_url]:
+                    self._schedule(webhook_url, 0) # Behind the webhooks already waiting.
+                else:
+                    del self._queues[webhook_url]
+                self._idle.notify_all()
+
+    def _send(self, session, delivery):
+        """
+        Posts with retries. Returns (delivered, error, retryable); delivered is
+        RATE_LIMITED if Discord answered 429 and the post should wait its turn again.
+        """
+        attempts = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = session.post(delivery.webhook_url, json=delivery.payload, timeout=(WEBHOOK_CONNECT_TIMEOUT, WEBHOOK_READ_TIMEOUT))
+            except requests.RequestException as e:
+                response = None
+                error = repr(e)
+                WEBHOOK_RESPONSES.inc(status="error")
+            else:
+                WEBHOOK_SECONDS.observe(time.perf_counter() - started)
+                WEBHOOK_RESPONSES.inc(status=response.status_code)
+                self._record_rate_limit(delivery.webhook_url, response)
+                error = f"{response.status_code} {response.text[:200]}"
+
+                if response.status_code == 429:
+                    delivery.rate_limited += 1
+                    if delivery.rate_limited > MAX_RATE_LIMIT_RETRIES:
+                        print(f"Giving up on webhook post after {delivery.rate_limited} rate limits.")
+                        return False, error, True
+                    return RATE_LIMITED, error, True # _record_rate_limit set the wait from Retry-After.
+                if response.status_code < 400:
+                    return True, None, False
+                if response.status_code < 500:
+                    # Other 4xx responses (bad payload, deleted webhook) won't succeed on retry.
+                    print(f"Error sending embed to webhook: {error}")
+                    return False, error, False
+
+            attempts += 1
+            if attempts >= MAX_DELIVERY_ATTEMPTS:
+                print(f"Error sending embed to webhook after {attempts} attempts: {error}")
+                return False, error, True
+            time.sleep(min(MAX_RETRY_BACKOFF, RETRY_BACKOFF_BASE * 2 ** (attempts - 1)))
+
+    def _record_rate_limit(self, webhook_url, response):
+        """Tracks Discord's X-RateLimit-* and Retry-After headers for the next request."""
+        headers = response.headers
+        now = time.time()
+        with self._lock:
+            bucket = headers.get('X-RateLimit-Bucket')
+            if bucket:
+                self._webhook_buckets[webhook_url] = bucket
+            bucket = self._webhook_buckets.get(webhook_url, webhook_url)
+
+            if response.status_code == 429:
+                retry_after = min(MAX_RATE_LIMIT_WAIT, _parse_retry_after(response))
+                if headers.get('X-RateLimit-Global', '').lower() == 'true' or headers.get('X-RateLimit-Scope') == 'global':
+                    self._global_reset_at = max(self._global_reset_at, now + retry_after)
+                else:
+                    self._bucket_reset_at[bucket] = now + retry_after
+            elif headers.get('X-RateLimit-Remaining') == '0':
+                try:
+                    self._bucket_reset_at[bucket] = now + min(MAX_RATE_LIMIT_WAIT, float(headers.get('X-RateLimit-Reset-After', 1)))
+                except ValueError:
+                    self._bucket_reset_at[bucket] = now + 1
+            else:
+                self._bucket_reset_at.pop(bucket, None)
+
+
+def _parse_retry_after(response):
+    """Seconds to wait after a 429, from the JSON body or the Retry-After header."""
+    try:
+        return float(response.json()['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get('Retry-After', 1))
+    except ValueError:
+        return 1.0
@@ -0,0 +1,39 @@
+# fetch.py
+# Feed download limits shared by the scheduler and the bulk importer, and a
+# blocking download that honours them. The scheduler's main loop fetches
+# with aiohttp under the same limits; this is for code outside that loop.
+
+import time
+import requests
+
+# --- Configuration ---
+FETCH_CONNECT_TIMEOUT = 10 # Seconds allowed to connect to a feed's host.
+FETCH_READ_TIMEOUT = 20 # Seconds allowed between two chunks of a feed's response.
+FETCH_TIMEOUT = 60 # Seconds allowed for a whole feed request, however slowly it trickles in.
+MAX_FEED_BYTES = 10 * 1024 * 1024 # Larger responses (after decompression) are abandoned.
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/116.0"
+
+
+class FeedTooLarge(Exception):
+    """A feed response grew past MAX_FEED_BYTES."""
+
+
+def download_feed(url, request_headers=None):
+    """
+    Downloads a feed with the timeouts and size cap above. Returns
+    (content, status_code, headers) with lower-cased header names.
+    """
+    headers = {"User-Agent": USER_AGENT}
+    headers.update(request_headers or {})
+    deadline = time.monotonic() + FETCH_TIMEOUT
+    with requests.get(url, headers=headers, stream=True, timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT)) as response:
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > MAX_FEED_BYTES:
+                raise FeedTooLarge(url)
+            if time.monotonic() > deadline:
+                raise requests.Timeout(url)
+            chunks.append(chunk)
+        return b"".join(chunks), response.status_code, {key.lower(): value for key, value in response.headers.items()}
@@ -0,0 +1,59 @@
+# file_cache.py
+# Caches parsed JSON files in memory and only re-reads them when the file's
+# mtime, size or inode changes. Shared by the web UI and the scheduler.
+
+import copy
+import json
+import os
+import threading
+
+
+class CachedJSONFile:
+    """
+    A JSON file parsed at most once per change on disk. get() returns the
+    shared parsed object, which callers must treat as read-only; use
+    get_copy() when the result is going to be modified.
+    """
+
+    def __init__(self, path, default=None):
+        self.path = path
+        self.default = default
+        self._lock = threading.Lock()
+        self._signature = None
+        self._value = None
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self):
+        signature = self._stat_signature()
+        with self._lock:
+            if signature is None:
+                self._signature = None
+                self._value = None
+                return copy.deepcopy(self.default)
+            if signature != self._signature:
+                try:
+                    with open(self.path, 'r') as f:
+                        content = f.read()
+                    if not content:
+                        raise ValueError("empty file") # Truncated by a writer that hasn't finished.
+                    value = json.loads(content)
+                except (ValueError, OSError):
+                    # Probably caught mid-write; keep serving the last good copy and retry next time.
+                    return self._value if self._value is not None else copy.deepcopy(self.default)
+                self._value = value
+                self._signature = signature
+            return self._value
+
+    def get_copy(self):
+        return copy.deepcopy(self.get())
+
+    def version(self):
+        """Changes whenever the file changes on disk; usable in ETags."""
+        signature = self._stat_signature()
+        return "-".join(str(part) for part in signature) if signature else "missing"
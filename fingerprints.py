@@ -0,0 +1,208 @@
+# fingerprints.py
+# Cross-feed duplicate suppression. Every delivered story is reduced to
+# fingerprints (its link without tracking parameters, and its normalized
+# title), scoped to the webhook it went to, and remembered in a rotating
+# Bloom filter: a fixed few MB however many stories pass through, at the
+# cost of a small false-positive rate. Feeds with "suppress_duplicates"
+# skip stories whose fingerprint was already posted to their webhook.
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+try:
+    import fcntl
+except ImportError: # Not on Windows; saves are then not coordinated between processes.
+    fcntl = None
+
+# --- Configuration ---
+FINGERPRINT_FILE = "fingerprints.bin"
+FINGERPRINT_WINDOW = 7 * 24 * 3600 # Seconds a posted story is remembered (at least).
+FINGERPRINT_GENERATIONS = 4 # The window is split into this many rotating filters, less one.
+FINGERPRINT_CAPACITY = 1000000 # Stories per window before the false-positive rate starts to climb.
+FINGERPRINT_ERROR_RATE = 0.001 # Chance that a new story is wrongly taken for a duplicate, at capacity.
+MIN_TITLE_WORDS = 4 # Shorter titles ("Update", "Weekly links") are too generic to match on.
+
+# Query parameters that only track where a click came from.
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src",
+                   "ref_url", "source", "cmpid", "ncid", "ito", "_hsenc", "_hsmi", "yclid", "spm"}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+
+# --- Fingerprints ---
+
+def canonical_link(url):
+    """A link with the scheme, "www.", fragment, trailing slash and tracking parameters stripped."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("", host, path, urlencode(query), ""))
+
+
+def normalize_title(title):
+    """Lowercased title with accents, punctuation and extra whitespace removed."""
+    text = unicodedata.normalize("NFKD", title or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+
+def story_fingerprints(webhook_url, link, title):
+    """The fingerprints a story is known by on one webhook."""
+    keys = []
+    if link:
+        keys.append(f"{webhook_url}\nlink\n{canonical_link(link)}")
+    title = normalize_title(title)
+    if len(title.split()) >= MIN_TITLE_WORDS:
+        keys.append(f"{webhook_url}\ntitle\n{title}")
+    return keys
+
+
+# --- Rotating Bloom Filter ---
+
+class RotatingBloomFilter:
+    """
+    A Bloom filter per time slice. Items are added to the current slice and
+    looked up in all of them; the oldest slice is dropped as time moves on,
+    so items are remembered for between `window` and `window` plus one slice.
+    Slices are numbered from the epoch, so processes sharing a file agree on them.
+    """
+
+    def __init__(self, window=FINGERPRINT_WINDOW, generations=FINGERPRINT_GENERATIONS,
+                 capacity=FINGERPRINT_CAPACITY, error_rate=FINGERPRINT_ERROR_RATE):
+        self.slice_seconds = max(1, window // (generations - 1))
+        self.generations = generations
+        per_slice = max(1, capacity // (generations - 1))
+        self.bits = int(math.ceil(-per_slice * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / per_slice * math.log(2)))
+        self._lock = threading.Lock()
+        self._slices = {} # slice number -> bytearray of self.bits bits
+        self._dirty = False
+        self._saved_mtime = None # mtime of the file when this process last read or wrote it
+
+    def _current_slice(self, now):
+        number = int((now or time.time()) // self.slice_seconds)
+        if number not in self._slices:
+            self._slices[number] = bytearray((self.bits + 7) // 8)
+            for old in [n for n in self._slices if n <= number - self.generations]:
+                del self._slices[old]
+        return number
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _contains(self, positions):
+        return any(all(bits[p >> 3] & (1 << (p & 7)) for p in positions) for bits in self._slices.values())
+
+    def contains(self, keys):
+        """True if any of the keys was (probably) added before."""
+        with self._lock:
+            return any(self._contains(self._positions(key)) for key in keys)
+
+    def add(self, keys, now=None):
+        """Adds keys. Returns True if any of them was (probably) already present."""
+        with self._lock:
+            current = self._slices[self._current_slice(now)]
+            seen = False
+            for key in keys:
+                positions = self._positions(key)
+                seen = seen or self._contains(positions)
+                for p in positions:
+                    current[p >> 3] |= 1 << (p & 7)
+            self._dirty = True
+            return seen
+
+    # --- Persistence ---
+
+    def _header(self):
+        return {"bits": self.bits, "hashes": self.hashes, "slice_seconds": self.slice_seconds}
+
+    def _read_file(self, f):
+        """{slice number: bytearray} from a saved filter, or {} if it was saved with other settings."""
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return {}
+        if {key: header.get(key) for key in self._header()} != self._header():
+            return {}
+        size = (self.bits + 7) // 8
+        slices = {}
+        for number in header.get("slices", []):
+            data = f.read(size)
+            if len(data) != size:
+                return {}
+            slices[number] = bytearray(data)
+        return slices
+
+    def _merge(self, slices):
+        # Caller holds self._lock. Bloom filters merge by OR-ing their bits.
+        oldest = max([*self._slices, *slices, 0]) - self.generations + 1
+        for number, data in slices.items():
+            if number < oldest:
+                continue
+            mine = self._slices.get(number)
+            if mine is None:
+                self._slices[number] = data
+            else:
+                merged = int.from_bytes(mine, "little") | int.from_bytes(data, "little")
+                self._slices[number] = bytearray(merged.to_bytes(len(mine), "little"))
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self, path=FINGERPRINT_FILE):
+        try:
+            with open(path, "rb") as f:
+                slices = self._read_file(f)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._merge(slices)
+            self._saved_mtime = self._mtime(path)
+
+    def save(self, path=FINGERPRINT_FILE):
+        """
+        Merges in what other processes saved, then writes the union back.
+        A lock file keeps two schedulers from saving at the same time.
+        """
+        if not self._dirty:
+            if self._mtime(path) != self._saved_mtime:
+                self.load(path) # Nothing new here; just pick up the other processes' stories.
+            return
+        with open(path + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(path, "rb") as f:
+                    on_disk = self._read_file(f)
+            except FileNotFoundError:
+                on_disk = {}
+            with self._lock:
+                self._current_slice(None)
+                self._merge(on_disk)
+                numbers = sorted(self._slices)
+                header = dict(self._header(), slices=numbers)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(json.dumps(header).encode("utf-8") + b"\n")
+                    for number in numbers:
+                        f.write(self._slices[number])
+                os.replace(tmp_path, path)
+                self._dirty = False
+                self._saved_mtime = self._mtime(path)
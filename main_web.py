@@ -4,24 +4,39 @@
 
 import os
 import json
+import time
 import uuid
-import yaml
-from flask import Flask, render_template_string, request, redirect, url_for, flash, get_flashed_messages, send_file, session, g
+import hashlib
+import threading
+from flask import (Flask, Blueprint, render_template, request, redirect, url_for, flash, get_flashed_messages, send_file,
+                   session, g, jsonify, Response, stream_with_context, current_app)
+from jinja2 import DictLoader
 from werkzeug.security import generate_password_hash, check_password_hash
-
-# --- Set a common User-Agent for all feedparser requests ---
-import feedparser
-feedparser.USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/116.0"
+from bulk_import import ImportJob, load_progress, parse_import_file
+from control import send_command
+from file_cache import CachedJSONFile
+from state_store import get_feed_state_store
 
 # --- Flask Web App Setup ---
-app = Flask(__name__)
+# Routes live on a blueprint; create_app() builds the app. Nothing touches
+# disk at import time, so gunicorn --preload can build it once in the master.
+web = Blueprint('web', __name__)
 
 # --- Configuration & State Files ---
 CONFIG_FILE = "config.json"
-SENT_ARTICLES_FILE = "sent_articles.yaml"
-FEED_STATE_FILE = "feed_state.json"
 USER_FILE = "user.json" # Stores the admin user's credentials
 SECRET_KEY_FILE = "secret.key" # Stores the Flask secret key
+FEEDS_PER_PAGE = 50 # Default page size for the feed list
+MAX_FEEDS_PER_PAGE = 500
+
+# --- Status Event Stream ---
+SSE_POLL_INTERVAL = 2 # Seconds between checks for feed state the scheduler changed.
+SSE_KEEPALIVE_INTERVAL = 15 # Seconds between keepalive comments on an idle stream.
+SSE_STREAM_SECONDS = 300 # A stream is closed after this long; the browser reconnects and resumes where it left off.
+SSE_RETRY_MS = 3000 # Reconnect delay suggested to the browser.
+# Each open stream holds one web thread for as long as it lasts, so they are
+# opt-in on the page and capped per worker process; keep this below --threads.
+MAX_EVENT_STREAMS = 4
 
 # --- HTML Templates ---
 
@@ -44,15 +59,15 @@ LAYOUT_TEMPLATE = """
         <div class="flex justify-between items-center mb-2">
             <h1 class="text-3xl font-bold text-center flex-grow">Discord RSS Bot Control Panel</h1>
             {% if g.user %}
-                <a href="{{ url_for('logout') }}" class="text-gray-400 hover:text-white transition-colors text-sm">Logout</a>
+                <a href="{{ url_for('web.logout') }}" class="text-gray-400 hover:text-white transition-colors text-sm">Logout</a>
             {% endif %}
         </div>
         
         {% if g.user %}
         <nav class="flex justify-center space-x-6 bg-gray-800 p-4 rounded-xl shadow-lg mb-6">
-            <a href="{{ url_for('view_feeds') }}" class="text-gray-300 hover:text-white transition-colors">View Feeds</a>
-            <a href="{{ url_for('add_feed') }}" class="text-gray-300 hover:text-white transition-colors">Add New Feed</a>
-            <a href="{{ url_for('backup_restore') }}" class="text-gray-300 hover:text-white transition-colors">Backup / Restore</a>
+            <a href="{{ url_for('web.view_feeds') }}" class="text-gray-300 hover:text-white transition-colors">View Feeds</a>
+            <a href="{{ url_for('web.add_feed') }}" class="text-gray-300 hover:text-white transition-colors">Add New Feed</a>
+            <a href="{{ url_for('web.backup_restore') }}" class="text-gray-300 hover:text-white transition-colors">Backup / Restore</a>
         </nav>
         {% endif %}
 
@@ -117,66 +132,198 @@ VIEW_FEEDS_TEMPLATE = """
 <div class="bg-gray-800 p-6 rounded-xl shadow-lg">
     <div class="flex justify-between items-center mb-4">
         <h2 class="text-2xl font-semibold">Existing Feeds</h2>
-        <a href="{{ url_for('add_feed') }}" class="bg-indigo-600 hover:bg-indigo-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200">
+        <label class="ml-auto mr-4 inline-flex items-center text-gray-300 text-sm" title="Keep the Status column current without reloading the page">
+            <input type="checkbox" id="live-updates" class="mr-2">
+            Live status
+            <span id="live-updates-note" class="ml-2 text-xs text-gray-400"></span>
+        </label>
+        <a href="{{ url_for('web.add_feed') }}" class="bg-indigo-600 hover:bg-indigo-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200">
             Add New Feed
         </a>
     </div>
+    <form method="get" action="{{ url_for('web.view_feeds') }}" class="flex flex-wrap items-center gap-2 mb-4">
+        <input type="search" name="q" value="{{ q }}" placeholder="Search name, feed URL or webhook" class="flex-grow shadow appearance-none border border-gray-700 rounded-lg py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+        <select name="status" class="border border-gray-700 rounded-lg py-2 px-3 bg-gray-700 text-gray-200">
+            {% for value, label in [('', 'All statuses'), ('ok', 'OK'), ('redirect', 'Redirect'), ('error', 'Error'), ('unchecked', 'Not checked yet')] %}
+            <option value="{{ value }}" {% if status == value %}selected{% endif %}>{{ label }}</option>
+            {% endfor %}
+        </select>
+        <input type="hidden" name="sort" value="{{ sort }}">
+        <input type="hidden" name="order" value="{{ order }}">
+        <input type="hidden" name="per_page" value="{{ per_page }}">
+        <button type="submit" class="bg-gray-700 hover:bg-gray-600 text-white font-bold py-2 px-4 rounded-lg transition-colors duration-200">Filter</button>
+    </form>
+    {% macro sort_header(key, label) %}
+        {% set next_order = 'desc' if sort == key and order == 'asc' else 'asc' %}
+        <th scope="col" class="px-6 py-4">
+            <a href="{{ url_for('web.view_feeds', q=q, status=status, sort=key, order=next_order, per_page=per_page) }}" class="hover:text-indigo-300">
+                {{ label }}{% if sort == key %} {{ '▲' if order == 'asc' else '▼' }}{% endif %}
+            </a>
+        </th>
+    {% endmacro %}
     <div class="overflow-x-auto">
         <table class="min-w-full text-left text-sm font-light">
             <thead class="border-b border-gray-600 font-medium">
                 <tr>
-                    <th scope="col" class="px-6 py-4">Status</th>
-                    <th scope="col" class="px-6 py-4">Server/Channel</th>
-                    <th scope="col" class="px-6 py-4">Feed URL</th>
-                    <th scope="col" class="px-6 py-4">Webhook URL</th>
-                    <th scope="col" class="px-6 py-4">Interval (s)</th>
+                    {{ sort_header('status', 'Status') }}
+                    {{ sort_header('name', 'Server/Channel') }}
+                    {{ sort_header('url', 'Feed URL') }}
+                    {{ sort_header('webhook', 'Webhook URL') }}
+                    {{ sort_header('interval', 'Interval (s)') }}
                     <th scope="col" class="px-6 py-4">Actions</th>
                 </tr>
             </thead>
             <tbody>
-                {% for feed in config.FEEDS %}
+                {% for feed in feeds %}
                 {% set state = feed_state.get(feed.id, {}) %}
                 {% set status_code = state.get('status_code') %}
                 <tr class="border-b border-gray-700">
-                    <td class="px-6 py-4 font-bold">
+                    <td class="px-6 py-4 font-bold" data-feed-status="{{ feed.id }}">
                         {% if status_code %}
-                            {% if 200 <= status_code < 300 %}
+                            {% if 200 <= status_code < 300 or status_code == 304 %}
                                 <span class="text-green-400">{{ status_code }}</span>
                             {% elif 300 <= status_code < 400 %}
                                 <span class="text-yellow-400">{{ status_code }}</span>
                             {% else %}
-                                <span class="text-red-400">{{ status_code }}</span>
+                                <span class="text-red-400" title="{{ state.get('error') or '' }}">{{ status_code }}</span>
                             {% endif %}
                         {% else %}
                             <span class="text-gray-500">N/A</span>
                         {% endif %}
+                        {% if state.get('parked') %}
+                            <div class="text-xs font-normal text-red-300">Parked</div>
+                        {% elif state.get('failure_streak') %}
+                            <div class="text-xs font-normal text-red-300">{{ state.failure_streak }} failure{{ 's' if state.failure_streak != 1 }}</div>
+                        {% endif %}
+                        {% if state.get('timeouts') %}
+                            <div class="text-xs font-normal text-yellow-300" title="Fetches or parses that ran out of time">{{ state.timeouts }} timeout{{ 's' if state.timeouts != 1 }}</div>
+                        {% endif %}
                     </td>
                     <td class="px-6 py-4 text-gray-300 truncate" style="max-width: 200px;">{{ feed.get('name', 'Not Set') }}</td>
                     <td class="px-6 py-4 font-mono text-xs truncate" style="max-width: 250px;">{{ feed.url }}</td>
                     <td class="px-6 py-4 font-mono text-xs truncate" style="max-width: 250px;">{{ feed.webhook_url }}</td>
-                    <td class="px-6 py-4">{{ feed.update_interval }}</td>
+                    <td class="px-6 py-4">
+                        {{ feed.update_interval }}
+                        {% if feed.get('adaptive') %}
+                            <div class="text-xs text-gray-400" title="Adaptive between {{ feed.get('min_interval') }}s and {{ feed.get('max_interval') }}s">learned: {{ state.get('learned_interval', feed.update_interval) }}</div>
+                        {% endif %}
+                    </td>
                     <td class="px-6 py-4 flex items-center space-x-4">
-                        <a href="{{ url_for('edit_feed', feed_id=feed.id) }}" class="text-indigo-400 hover:text-indigo-300">Edit</a>
-                        <form action="{{ url_for('delete_feed', feed_id=feed.id) }}" method="post" onsubmit="return confirm('Are you sure you want to delete this feed?');">
+                        <a href="{{ url_for('web.edit_feed', feed_id=feed.id) }}" class="text-indigo-400 hover:text-indigo-300">Edit</a>
+                        <form action="{{ url_for('web.check_feed', feed_id=feed.id) }}" method="post">
+                            <button type="submit" class="text-green-400 hover:text-green-300">Check Now</button>
+                        </form>
+                        <form action="{{ url_for('web.delete_feed', feed_id=feed.id) }}" method="post" onsubmit="return confirm('Are you sure you want to delete this feed?');">
                             <button type="submit" class="text-red-500 hover:text-red-400">Delete</button>
                         </form>
                     </td>
                 </tr>
                 {% else %}
                 <tr>
-                    <td colspan="6" class="text-center py-8 text-gray-400">No feeds configured. <a href="{{ url_for('add_feed') }}" class="text-indigo-400 hover:underline">Add one now!</a></td>
+                    {% if total_feeds %}
+                    <td colspan="6" class="text-center py-8 text-gray-400">No feeds match your filter.</td>
+                    {% else %}
+                    <td colspan="6" class="text-center py-8 text-gray-400">No feeds configured. <a href="{{ url_for('web.add_feed') }}" class="text-indigo-400 hover:underline">Add one now!</a></td>
+                    {% endif %}
                 </tr>
                 {% endfor %}
             </tbody>
         </table>
     </div>
+    {% if matched %}
+    <div class="flex justify-between items-center mt-4 text-sm text-gray-400">
+        <span>Showing {{ (page - 1) * per_page + 1 }}–{{ (page - 1) * per_page + feeds|length }} of {{ matched }}{% if matched != total_feeds %} (filtered from {{ total_feeds }}){% endif %}</span>
+        <div class="space-x-4">
+            {% if page > 1 %}
+            <a href="{{ url_for('web.view_feeds', q=q, status=status, sort=sort, order=order, per_page=per_page, page=page - 1) }}" class="text-indigo-400 hover:text-indigo-300">&larr; Previous</a>
+            {% endif %}
+            <span>Page {{ page }} of {{ pages }}</span>
+            {% if page < pages %}
+            <a href="{{ url_for('web.view_feeds', q=q, status=status, sort=sort, order=order, per_page=per_page, page=page + 1) }}" class="text-indigo-400 hover:text-indigo-300">Next &rarr;</a>
+            {% endif %}
+        </div>
+    </div>
+    {% endif %}
 </div>
+<script>
+// Live status, when switched on: the server pushes only the feed state records
+// that changed. Hidden tabs disconnect, since every stream holds a server thread.
+(function () {
+    var toggle = document.getElementById('live-updates');
+    var note = document.getElementById('live-updates-note');
+    if (!window.EventSource) {
+        toggle.disabled = true;
+        return;
+    }
+    function escapeHtml(text) {
+        var div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+    function plural(count, word) {
+        return count + ' ' + word + (count !== 1 ? 's' : '');
+    }
+    function statusHtml(state) {
+        var code = state.status_code, html;
+        if (!code) {
+            html = '<span class="text-gray-500">N/A</span>';
+        } else if ((code >= 200 && code < 300) || code === 304) {
+            html = '<span class="text-green-400">' + code + '</span>';
+        } else if (code >= 300 && code < 400) {
+            html = '<span class="text-yellow-400">' + code + '</span>';
+        } else {
+            html = '<span class="text-red-400" title="' + escapeHtml(state.error || '') + '">' + code + '</span>';
+        }
+        if (state.parked) {
+            html += '<div class="text-xs font-normal text-red-300">Parked</div>';
+        } else if (state.failure_streak) {
+            html += '<div class="text-xs font-normal text-red-300">' + plural(state.failure_streak, 'failure') + '</div>';
+        }
+        if (state.timeouts) {
+            html += '<div class="text-xs font-normal text-yellow-300" title="Fetches or parses that ran out of time">' + plural(state.timeouts, 'timeout') + '</div>';
+        }
+        return html;
+    }
+    var source = null, lastEventId = "{{ revision }}";
+    function connect() {
+        if (source || !toggle.checked || document.hidden) return;
+        note.textContent = '';
+        source = new EventSource("{{ url_for('web.feed_events') }}?since=" + lastEventId);
+        source.addEventListener('state', function (event) {
+            if (event.lastEventId) lastEventId = event.lastEventId;
+            var update = JSON.parse(event.data);
+            var cell = document.querySelector('[data-feed-status="' + update.feed_id + '"]');
+            if (cell) cell.innerHTML = statusHtml(update.state);
+        });
+        source.addEventListener('error', function () {
+            if (source.readyState === EventSource.CLOSED) {
+                // Refused (too many open streams): the browser won't retry by itself.
+                disconnect();
+                note.textContent = 'unavailable, reload to retry';
+            }
+        });
+    }
+    function disconnect() {
+        if (source) source.close();
+        source = null;
+    }
+    toggle.checked = localStorage.getItem('liveUpdates') === '1';
+    toggle.addEventListener('change', function () {
+        localStorage.setItem('liveUpdates', toggle.checked ? '1' : '0');
+        toggle.checked ? connect() : disconnect();
+    });
+    document.addEventListener('visibilitychange', function () {
+        document.hidden ? disconnect() : connect();
+    });
+    connect();
+})();
+</script>
 """
 
 ADD_FEED_TEMPLATE = """
 <div class="bg-gray-800 p-6 rounded-xl shadow-lg">
     <h2 class="text-2xl font-semibold mb-4">Add a New Feed</h2>
-    <form action="{{ url_for('add_feed') }}" method="post">
+    <form action="{{ url_for('web.add_feed') }}" method="post">
         <div class="mb-4">
             <label for="name" class="block text-gray-300 text-sm font-bold mb-2">Server/Channel Name (Optional)</label>
             <input type="text" name="name" id="name" placeholder="e.g., My Server - #announcements" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
@@ -189,10 +336,49 @@ ADD_FEED_TEMPLATE = """
             <label for="webhook_url" class="block text-gray-300 text-sm font-bold mb-2">Discord Webhook URL</label>
             <input type="url" name="webhook_url" id="webhook_url" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500" required>
         </div>
-        <div class="mb-6">
+        <div class="mb-4">
+            <label class="inline-flex items-center text-gray-300 text-sm font-bold">
+                <input type="checkbox" name="suppress_duplicates" class="mr-2">
+                Skip Duplicate Stories
+            </label>
+            <p class="text-gray-400 text-xs mt-1">Don't post a story that another feed already posted to this webhook in the past week, matched by its link (ignoring tracking parameters) or its title.</p>
+        </div>
+        <div class="mb-4 grid grid-cols-2 gap-4">
+            <div>
+                <label for="digest" class="block text-gray-300 text-sm font-bold mb-2">Digest</label>
+                <select name="digest" id="digest" class="shadow border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+                    <option value="">Off</option>
+                    <option value="embeds">Batched posts (up to 10 per message)</option>
+                    <option value="summary">Single summary of links</option>
+                </select>
+            </div>
+            <div>
+                <label for="digest_window" class="block text-gray-300 text-sm font-bold mb-2">Digest Window (seconds)</label>
+                <input type="number" name="digest_window" id="digest_window" value="300" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+            </div>
+            <p class="col-span-2 text-gray-400 text-xs">Collect new posts for this feed's webhook and send them together at the end of each window, instead of one message per post.</p>
+        </div>
+        <div class="mb-4">
             <label for="update_interval" class="block text-gray-300 text-sm font-bold mb-2">Refresh Interval (seconds)</label>
             <input type="number" name="update_interval" id="update_interval" value="300" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500" required>
         </div>
+        <div class="mb-4">
+            <label class="inline-flex items-center text-gray-300 text-sm font-bold">
+                <input type="checkbox" name="adaptive" class="mr-2">
+                Adaptive Interval
+            </label>
+            <p class="text-gray-400 text-xs mt-1">Learn how often the feed publishes and poll between the minimum and maximum below, starting from the refresh interval. Failing feeds back off and are parked after repeated errors.</p>
+        </div>
+        <div class="mb-6 grid grid-cols-2 gap-4">
+            <div>
+                <label for="min_interval" class="block text-gray-300 text-sm font-bold mb-2">Minimum Interval (seconds)</label>
+                <input type="number" name="min_interval" id="min_interval" value="60" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+            </div>
+            <div>
+                <label for="max_interval" class="block text-gray-300 text-sm font-bold mb-2">Maximum Interval (seconds)</label>
+                <input type="number" name="max_interval" id="max_interval" value="21600" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+            </div>
+        </div>
         <button type="submit" class="bg-indigo-600 hover:bg-indigo-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200">
             Add Feed
         </button>
@@ -203,7 +389,7 @@ ADD_FEED_TEMPLATE = """
 EDIT_FEED_TEMPLATE = """
 <div class="bg-gray-800 p-6 rounded-xl shadow-lg">
     <h2 class="text-2xl font-semibold mb-4">Edit Feed</h2>
-    <form action="{{ url_for('edit_feed', feed_id=feed.id) }}" method="post">
+    <form action="{{ url_for('web.edit_feed', feed_id=feed.id) }}" method="post">
         <div class="mb-4">
             <label for="name" class="block text-gray-300 text-sm font-bold mb-2">Server/Channel Name (Optional)</label>
             <input type="text" name="name" id="name" value="{{ feed.get('name', '') }}" placeholder="e.g., My Server - #announcements" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
@@ -216,15 +402,54 @@ EDIT_FEED_TEMPLATE = """
             <label for="webhook_url" class="block text-gray-300 text-sm font-bold mb-2">Discord Webhook URL</label>
             <input type="url" name="webhook_url" id="webhook_url" value="{{ feed.webhook_url }}" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500" required>
         </div>
-        <div class="mb-6">
+        <div class="mb-4">
+            <label class="inline-flex items-center text-gray-300 text-sm font-bold">
+                <input type="checkbox" name="suppress_duplicates" class="mr-2" {% if feed.get('suppress_duplicates') %}checked{% endif %}>
+                Skip Duplicate Stories
+            </label>
+            <p class="text-gray-400 text-xs mt-1">Don't post a story that another feed already posted to this webhook in the past week, matched by its link (ignoring tracking parameters) or its title.</p>
+        </div>
+        <div class="mb-4 grid grid-cols-2 gap-4">
+            <div>
+                <label for="digest" class="block text-gray-300 text-sm font-bold mb-2">Digest</label>
+                <select name="digest" id="digest" class="shadow border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+                    <option value="">Off</option>
+                    <option value="embeds"{% if feed.get('digest') == 'embeds' %} selected{% endif %}>Batched posts (up to 10 per message)</option>
+                    <option value="summary"{% if feed.get('digest') == 'summary' %} selected{% endif %}>Single summary of links</option>
+                </select>
+            </div>
+            <div>
+                <label for="digest_window" class="block text-gray-300 text-sm font-bold mb-2">Digest Window (seconds)</label>
+                <input type="number" name="digest_window" id="digest_window" value="{{ feed.get('digest_window', 300) }}" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+            </div>
+            <p class="col-span-2 text-gray-400 text-xs">Collect new posts for this feed's webhook and send them together at the end of each window, instead of one message per post.</p>
+        </div>
+        <div class="mb-4">
             <label for="update_interval" class="block text-gray-300 text-sm font-bold mb-2">Refresh Interval (seconds)</label>
             <input type="number" name="update_interval" id="update_interval" value="{{ feed.update_interval }}" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500" required>
         </div>
+        <div class="mb-4">
+            <label class="inline-flex items-center text-gray-300 text-sm font-bold">
+                <input type="checkbox" name="adaptive" class="mr-2" {% if feed.get('adaptive') %}checked{% endif %}>
+                Adaptive Interval
+            </label>
+            <p class="text-gray-400 text-xs mt-1">Learn how often the feed publishes and poll between the minimum and maximum below, starting from the refresh interval. Failing feeds back off and are parked after repeated errors.</p>
+        </div>
+        <div class="mb-6 grid grid-cols-2 gap-4">
+            <div>
+                <label for="min_interval" class="block text-gray-300 text-sm font-bold mb-2">Minimum Interval (seconds)</label>
+                <input type="number" name="min_interval" id="min_interval" value="{{ feed.get('min_interval', 60) }}" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+            </div>
+            <div>
+                <label for="max_interval" class="block text-gray-300 text-sm font-bold mb-2">Maximum Interval (seconds)</label>
+                <input type="number" name="max_interval" id="max_interval" value="{{ feed.get('max_interval', 21600) }}" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+            </div>
+        </div>
         <div class="flex items-center space-x-4">
             <button type="submit" class="bg-indigo-600 hover:bg-indigo-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200">
                 Save Changes
             </button>
-            <a href="{{ url_for('view_feeds') }}" class="text-gray-400 hover:text-white">Cancel</a>
+            <a href="{{ url_for('web.view_feeds') }}" class="text-gray-400 hover:text-white">Cancel</a>
         </div>
     </form>
 </div>
@@ -238,17 +463,56 @@ BACKUP_RESTORE_TEMPLATE = """
     <div class="mb-6">
         <h3 class="text-lg font-medium mb-2">Download Backup</h3>
         <p class="text-gray-400 text-sm mb-3">Saves a copy of your `config.json` file containing all your feeds.</p>
-        <a href="{{ url_for('download_backup') }}" class="bg-indigo-600 hover:bg-indigo-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200 inline-block">
+        <a href="{{ url_for('web.download_backup') }}" class="bg-indigo-600 hover:bg-indigo-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200 inline-block">
             Download config.json
         </a>
     </div>
 
     <hr class="border-gray-700 my-6">
 
+    <div>
+        <h3 class="text-lg font-medium mb-2">Bulk Import</h3>
+        <p class="text-gray-400 text-sm mb-3">Add many feeds at once from an OPML export or a JSON file (a `config.json` backup or a list of feed URLs). Imported feeds are added to your current configuration; every URL is checked first and only working feeds are added. Their current articles are marked as already posted, so only new articles will be sent.</p>
+        <form action="{{ url_for('web.bulk_import') }}" method="post" enctype="multipart/form-data">
+            <div class="mb-4">
+                <input type="file" name="import_file" accept=".opml,.xml,.json" required class="block w-full text-sm text-gray-400 file:mr-4 file:py-2 file:px-4 file:rounded-lg file:border-0 file:text-sm file:font-semibold file:bg-indigo-600 file:text-white hover:file:bg-indigo-700">
+            </div>
+            <div class="mb-4">
+                <label for="import_webhook_url" class="block text-gray-300 text-sm font-bold mb-2">Discord Webhook URL</label>
+                <input type="url" name="webhook_url" id="import_webhook_url" placeholder="Used for feeds that don't name their own webhook" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+            </div>
+            <div class="mb-4 grid grid-cols-3 gap-4">
+                <div>
+                    <label for="import_update_interval" class="block text-gray-300 text-sm font-bold mb-2">Refresh Interval (seconds)</label>
+                    <input type="number" name="update_interval" id="import_update_interval" value="300" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500" required>
+                </div>
+                <div>
+                    <label for="import_min_interval" class="block text-gray-300 text-sm font-bold mb-2">Minimum Interval (seconds)</label>
+                    <input type="number" name="min_interval" id="import_min_interval" value="60" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+                </div>
+                <div>
+                    <label for="import_max_interval" class="block text-gray-300 text-sm font-bold mb-2">Maximum Interval (seconds)</label>
+                    <input type="number" name="max_interval" id="import_max_interval" value="21600" min="60" class="shadow appearance-none border border-gray-700 rounded-lg w-full py-2 px-3 bg-gray-700 text-gray-200 leading-tight focus:outline-none focus:shadow-outline focus:border-indigo-500">
+                </div>
+            </div>
+            <div class="mb-4">
+                <label class="inline-flex items-center text-gray-300 text-sm font-bold">
+                    <input type="checkbox" name="adaptive" class="mr-2">
+                    Adaptive Interval
+                </label>
+            </div>
+            <button type="submit" class="bg-green-600 hover:bg-green-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200">
+                Import Feeds
+            </button>
+        </form>
+    </div>
+
+    <hr class="border-gray-700 my-6">
+
     <div>
         <h3 class="text-lg font-medium mb-2">Restore from Backup</h3>
         <p class="text-gray-400 text-sm mb-3">Upload a `config.json` file to restore your feeds. This will overwrite your current configuration.</p>
-        <form action="{{ url_for('upload_backup') }}" method="post" enctype="multipart/form-data">
+        <form action="{{ url_for('web.upload_backup') }}" method="post" enctype="multipart/form-data">
             <div class="flex items-center space-x-4">
                 <input type="file" name="backup_file" accept=".json" required class="block w-full text-sm text-gray-400 file:mr-4 file:py-2 file:px-4 file:rounded-lg file:border-0 file:text-sm file:font-semibold file:bg-indigo-600 file:text-white hover:file:bg-indigo-700">
                 <button type="submit" class="bg-green-600 hover:bg-green-700 text-white font-bold py-2 px-4 rounded-lg focus:outline-none focus:shadow-outline transition-colors duration-200">
@@ -260,6 +524,41 @@ BACKUP_RESTORE_TEMPLATE = """
 </div>
 """
 
+IMPORT_STATUS_TEMPLATE = """
+<div class="bg-gray-800 p-6 rounded-xl shadow-lg">
+    <h2 class="text-2xl font-semibold mb-4">Importing {{ job.filename }}</h2>
+    <div class="w-full bg-gray-700 rounded-lg h-4 mb-3">
+        <div class="bg-indigo-600 h-4 rounded-lg" style="width: {{ (100 * job.done / job.total) | round | int if job.total else 100 }}%"></div>
+    </div>
+    <p class="text-gray-300 mb-4">
+        {{ job.done }} of {{ job.total }} checked
+        &middot; <span class="text-green-400">{{ job.added if job.finished else job.rows | selectattr('result', 'equalto', 'valid') | list | length }} {{ 'added' if job.finished else 'valid' }}</span>
+        &middot; <span class="text-yellow-400">{{ job.skipped }} already configured</span>
+        &middot; <span class="text-red-400">{{ job.failed }} failed</span>
+        {% if job.finished %}&middot; Done.{% else %}&middot; Working&hellip;{% endif %}
+    </p>
+    {% if job.error %}<p class="text-red-400 mb-4">Import could not be saved: {{ job.error }}</p>{% endif %}
+    <div class="overflow-x-auto">
+        <table class="w-full text-sm text-left text-gray-400">
+            <thead class="text-xs text-gray-300 uppercase bg-gray-700">
+                <tr><th class="px-4 py-2">Result</th><th class="px-4 py-2">Feed URL</th><th class="px-4 py-2">Details</th></tr>
+            </thead>
+            <tbody>
+                {% for row in job.rows %}
+                <tr class="border-b border-gray-700">
+                    <td class="px-4 py-2 font-bold {{ {'added': 'text-green-400', 'valid': 'text-green-400', 'skipped': 'text-yellow-400', 'failed': 'text-red-400'}.get(row.result, 'text-gray-500') }}">{{ row.result }}</td>
+                    <td class="px-4 py-2 font-mono text-xs truncate" style="max-width: 350px;">{{ row.url }}</td>
+                    <td class="px-4 py-2 truncate" style="max-width: 300px;">{{ row.detail }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+    <a href="{{ url_for('web.view_feeds') }}" class="inline-block mt-4 text-indigo-400 hover:text-indigo-300">Back to feeds</a>
+    {% if not job.finished %}<script>setTimeout(function () { location.reload(); }, 2000);</script>{% endif %}
+</div>
+"""
+
 # This dictionary will act as a simple template loader.
 TEMPLATES = {
     "layout": LAYOUT_TEMPLATE,
@@ -267,41 +566,67 @@ TEMPLATES = {
     "add_feed": ADD_FEED_TEMPLATE,
     "edit_feed": EDIT_FEED_TEMPLATE,
     "backup_restore": BACKUP_RESTORE_TEMPLATE,
+    "import_status": IMPORT_STATUS_TEMPLATE,
     "setup": SETUP_TEMPLATE,
     "login": LOGIN_TEMPLATE
 }
 
+# Each page is the layout with its content spliced in. Serving them through a
+# DictLoader lets Jinja compile every page once and reuse it from its cache.
+PAGE_TEMPLATES = {
+    f"{name}.html": LAYOUT_TEMPLATE.replace('{% block content %}{% endblock %}', content)
+    for name, content in TEMPLATES.items() if name != "layout"
+}
+
 # --- Configuration and State Management ---
 
 def save_config(config_data):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config_data, f, indent=4)
+    write_config_file(json.dumps(config_data, indent=4))
+
+def write_config_file(content):
+    """Replaces config.json in one step, so the scheduler never reads a half-written file."""
+    tmp_path = CONFIG_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, CONFIG_FILE)
+
+def apply_config_change():
+    """
+    Asks the running schedulers to reload config.json now. Returns False if
+    none could be reached; they still notice the change within a few seconds.
+    """
+    return any(reply.get('ok') for reply in send_command("reload"))
+
+def check_feed_now(feed_id):
+    """Asks the scheduler to check a feed straight away. Returns (ok, message)."""
+    replies = send_command("check", feed_id=feed_id)
+    if not replies:
+        return False, "The scheduler isn't running or can't be reached."
+    for reply in replies:
+        if reply.get('ok'):
+            if reply.get('status') == "running":
+                return True, "This feed is being checked right now."
+            return True, "Checking this feed now."
+    return False, f"The scheduler could not check this feed: {replies[0].get('error')}"
 
 def initialize_files():
     """Ensure all necessary files exist before the app starts."""
     if not os.path.exists(CONFIG_FILE):
         save_config({"FEEDS": []})
-    if not os.path.exists(SENT_ARTICLES_FILE):
-        with open(SENT_ARTICLES_FILE, 'w') as f: yaml.dump([], f)
-    if not os.path.exists(FEED_STATE_FILE):
-        with open(FEED_STATE_FILE, 'w') as f: json.dump({}, f)
+    get_feed_state_store() # Creates feed_state.db (or imports feed_state.json)
     # User file is checked separately by the auth logic
 
+# Parsed once per change on disk and shared across requests. The cached
+# objects are read-only; load_config() hands out a copy for editing.
+config_cache = CachedJSONFile(CONFIG_FILE, default={"FEEDS": []})
+user_cache = CachedJSONFile(USER_FILE)
+
 def load_config():
-    with open(CONFIG_FILE, 'r') as f:
-        return json.load(f)
+    return config_cache.get_copy()
 
 def load_feed_state():
-    try:
-        with open(FEED_STATE_FILE, 'r') as f:
-            content = f.read()
-            if not content: return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-# --- Initialize files on application startup ---
-initialize_files()
+    # Refreshed from the records the scheduler changed since the last request; read-only.
+    return get_feed_state_store().snapshot()
 
 # --- Authentication Logic ---
 
@@ -317,45 +642,56 @@ def get_secret_key():
         with open(SECRET_KEY_FILE, 'rb') as f:
             return f.read()
 
-app.secret_key = get_secret_key()
+def get_admin_user():
+    """Loads the admin user from the JSON file (cached until the file changes)."""
+    return user_cache.get()
 
 def admin_user_exists():
-    return os.path.exists(USER_FILE)
+    # The user file is read once per request in load_logged_in_user.
+    return g.admin_user is not None
 
-def get_admin_user():
-    """Safely loads the admin user from the JSON file."""
-    if not os.path.exists(USER_FILE):
-        return None
-    try:
-        with open(USER_FILE, 'r') as f:
-            content = f.read()
-            if not content:
-                return None
-            return json.loads(content)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return None
-
-@app.before_request
+@web.before_app_request
 def load_logged_in_user():
+    g.admin_user = get_admin_user()
     user_id = session.get('user_id')
-    g.user = get_admin_user() if user_id else None
+    g.user = g.admin_user if user_id else None
 
-@app.before_request
+@web.before_app_request
 def require_login_or_setup():
+    admin_exists = admin_user_exists()
     # Allow access to setup if no admin exists
-    if not admin_user_exists() and request.endpoint != 'setup':
-        return redirect(url_for('setup'))
+    if not admin_exists and request.endpoint != 'web.setup':
+        return redirect(url_for('web.setup'))
     
     # If admin exists, require login for all pages except login/setup
-    if admin_user_exists() and g.user is None and request.endpoint not in ['login', 'setup']:
-        return redirect(url_for('login'))
+    if admin_exists and g.user is None and request.endpoint not in ['web.login', 'web.setup']:
+        if request.path.startswith('/api/'):
+            return jsonify(error="Login required."), 401
+        return redirect(url_for('web.login'))
 
 # --- Flask Routes ---
 
-@app.route('/setup', methods=['GET', 'POST'])
+def feed_settings_from_form(form):
+    """Reads the editable feed fields shared by the add and edit forms."""
+    update_interval = int(form['update_interval'])
+    min_interval = int(form.get('min_interval') or 60)
+    return {
+        "name": form['name'],
+        "url": form['url'],
+        "webhook_url": form['webhook_url'],
+        "update_interval": update_interval,
+        "adaptive": 'adaptive' in form,
+        "suppress_duplicates": 'suppress_duplicates' in form,
+        "digest": form.get('digest') or None,
+        "digest_window": max(60, int(form.get('digest_window') or 300)),
+        "min_interval": min_interval,
+        "max_interval": max(min_interval, int(form.get('max_interval') or 21600)),
+    }
+
+@web.route('/setup', methods=['GET', 'POST'])
 def setup():
     if admin_user_exists():
-        return redirect(url_for('login'))
+        return redirect(url_for('web.login'))
     
     if request.method == 'POST':
         username = request.form['username']
@@ -370,120 +706,171 @@ def setup():
             json.dump(user_data, f)
         
         flash('Admin account created successfully! Please log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('web.login'))
 
-    full_html = TEMPLATES["layout"].replace('{% block content %}{% endblock %}', TEMPLATES["setup"])
-    return render_template_string(full_html)
+    return render_template("setup.html")
 
-@app.route('/login', methods=['GET', 'POST'])
+@web.route('/login', methods=['GET', 'POST'])
 def login():
     if g.user:
-        return redirect(url_for('view_feeds'))
+        return redirect(url_for('web.view_feeds'))
     
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        user = get_admin_user()
+        user = g.admin_user
         error = "Invalid username or password." # Generic error for security
 
         if user and user.get('username') == username and check_password_hash(user.get('password', ''), password):
             session.clear()
             session['user_id'] = user['id']
-            return redirect(url_for('view_feeds'))
+            return redirect(url_for('web.view_feeds'))
         else:
             flash(error, 'error')
 
-    full_html = TEMPLATES["layout"].replace('{% block content %}{% endblock %}', TEMPLATES["login"])
-    return render_template_string(full_html)
+    return render_template("login.html")
 
-@app.route('/logout')
+@web.route('/logout')
 def logout():
     session.clear()
     flash('You have been logged out.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('web.login'))
+
+def status_category(status_code):
+    if not status_code:
+        return 'unchecked'
+    if 200 <= status_code < 300 or status_code == 304:
+        return 'ok'
+    if 300 <= status_code < 400:
+        return 'redirect'
+    return 'error'
+
+FEED_SORT_KEYS = {
+    'name': lambda feed, state: feed.get('name', '').lower(),
+    'url': lambda feed, state: feed['url'].lower(),
+    'webhook': lambda feed, state: feed['webhook_url'].lower(),
+    'interval': lambda feed, state: feed['update_interval'],
+    'status': lambda feed, state: state.get('status_code') or 0,
+}
+
+def query_feeds(feeds, feed_state, q='', status='', sort='', order='asc'):
+    """Filters and sorts feeds server-side for the paginated feed list."""
+    q = q.strip().lower()
+    matched = []
+    for feed in feeds:
+        state = feed_state.get(feed['id'], {})
+        if q and q not in feed.get('name', '').lower() and q not in feed['url'].lower() and q not in feed['webhook_url'].lower():
+            continue
+        if status and status_category(state.get('status_code')) != status:
+            continue
+        matched.append(feed)
+    if sort in FEED_SORT_KEYS:
+        sort_key = FEED_SORT_KEYS[sort]
+        matched.sort(key=lambda feed: sort_key(feed, feed_state.get(feed['id'], {})), reverse=(order == 'desc'))
+    return matched
 
-@app.route('/')
+def paginate(items, page, per_page):
+    """Returns (items on the page, page, pages), with page clamped to the valid range."""
+    pages = max(1, -(-len(items) // per_page))
+    page = min(max(page, 1), pages)
+    return items[(page - 1) * per_page:page * per_page], page, pages
+
+@web.route('/')
 def view_feeds():
-    config = load_config()
+    config = config_cache.get()
+    revision = get_feed_state_store().revision() # Live updates resume from here.
     feed_state = load_feed_state()
-    full_html = TEMPLATES["layout"].replace('{% block content %}{% endblock %}', TEMPLATES["view_feeds"])
-    return render_template_string(full_html, config=config, feed_state=feed_state)
+    q = request.args.get('q', '')
+    status = request.args.get('status', '')
+    sort = request.args.get('sort', '')
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    per_page = min(max(request.args.get('per_page', FEEDS_PER_PAGE, type=int), 1), MAX_FEEDS_PER_PAGE)
 
-@app.route('/add', methods=['GET', 'POST'])
+    matched = query_feeds(config.get('FEEDS', []), feed_state, q, status, sort, order)
+    feeds, page, pages = paginate(matched, request.args.get('page', 1, type=int), per_page)
+    return render_template("view_feeds.html", feeds=feeds, feed_state=feed_state, revision=revision,
+                           total_feeds=len(config.get('FEEDS', [])), matched=len(matched),
+                           page=page, pages=pages, per_page=per_page, q=q, status=status, sort=sort, order=order)
+
+@web.route('/add', methods=['GET', 'POST'])
 def add_feed():
     if request.method == 'POST':
         config = load_config()
-        new_feed = {
-            "id": str(uuid.uuid4()),
-            "name": request.form['name'],
-            "url": request.form['url'],
-            "webhook_url": request.form['webhook_url'],
-            "update_interval": int(request.form['update_interval'])
-        }
+        new_feed = {"id": str(uuid.uuid4())}
+        new_feed.update(feed_settings_from_form(request.form))
         config['FEEDS'].append(new_feed)
         save_config(config)
-        flash(f'Feed "{new_feed["url"]}" added! The scheduler will perform an initial check on its next cycle.', 'success')
-        return redirect(url_for('view_feeds'))
+        if apply_config_change():
+            flash(f'Feed "{new_feed["url"]}" added! The scheduler is checking it now.', 'success')
+        else:
+            flash(f'Feed "{new_feed["url"]}" added! The scheduler will perform an initial check once it picks up the change.', 'success')
+        return redirect(url_for('web.view_feeds'))
     
-    full_html = TEMPLATES["layout"].replace('{% block content %}{% endblock %}', TEMPLATES["add_feed"])
-    return render_template_string(full_html)
+    return render_template("add_feed.html")
 
-@app.route('/edit/<feed_id>', methods=['GET', 'POST'])
+@web.route('/edit/<feed_id>', methods=['GET', 'POST'])
 def edit_feed(feed_id):
     config = load_config()
     feed_to_edit = next((feed for feed in config['FEEDS'] if feed['id'] == feed_id), None)
 
     if feed_to_edit is None:
         flash('Feed not found.', 'error')
-        return redirect(url_for('view_feeds'))
+        return redirect(url_for('web.view_feeds'))
 
     if request.method == 'POST':
         for i, feed in enumerate(config['FEEDS']):
             if feed['id'] == feed_id:
-                config['FEEDS'][i]['name'] = request.form['name']
-                config['FEEDS'][i]['url'] = request.form['url']
-                config['FEEDS'][i]['webhook_url'] = request.form['webhook_url']
-                config['FEEDS'][i]['update_interval'] = int(request.form['update_interval'])
+                config['FEEDS'][i].update(feed_settings_from_form(request.form))
                 break
         
         save_config(config)
+        apply_config_change()
         flash(f'Feed updated successfully!', 'success')
-        return redirect(url_for('view_feeds'))
+        return redirect(url_for('web.view_feeds'))
 
-    full_html = TEMPLATES["layout"].replace('{% block content %}{% endblock %}', TEMPLATES["edit_feed"])
-    return render_template_string(full_html, feed=feed_to_edit)
+    return render_template("edit_feed.html", feed=feed_to_edit)
 
-@app.route('/delete/<feed_id>', methods=['POST'])
+@web.route('/delete/<feed_id>', methods=['POST'])
 def delete_feed(feed_id):
     config = load_config()
     feed_to_delete = next((feed for feed in config['FEEDS'] if feed['id'] == feed_id), None)
     if feed_to_delete:
         config['FEEDS'] = [feed for feed in config['FEEDS'] if feed['id'] != feed_id]
         save_config(config)
+        apply_config_change()
         flash(f'Feed "{feed_to_delete["url"]}" deleted.', 'success')
     else:
         flash('Feed not found.', 'error')
-    return redirect(url_for('view_feeds'))
+    return redirect(url_for('web.view_feeds'))
 
-@app.route('/backup-restore')
+@web.route('/check/<feed_id>', methods=['POST'])
+def check_feed(feed_id):
+    feed = next((feed for feed in config_cache.get().get('FEEDS', []) if feed['id'] == feed_id), None)
+    if feed is None:
+        flash('Feed not found.', 'error')
+        return redirect(url_for('web.view_feeds'))
+    ok, message = check_feed_now(feed_id)
+    flash(f'{feed["url"]}: {message}', 'success' if ok else 'error')
+    return redirect(request.referrer or url_for('web.view_feeds'))
+
+@web.route('/backup-restore')
 def backup_restore():
-    full_html = TEMPLATES["layout"].replace('{% block content %}{% endblock %}', TEMPLATES["backup_restore"])
-    return render_template_string(full_html)
+    return render_template("backup_restore.html")
 
-@app.route('/backup/download')
+@web.route('/backup/download')
 def download_backup():
     return send_file(CONFIG_FILE, as_attachment=True)
 
-@app.route('/backup/upload', methods=['POST'])
+@web.route('/backup/upload', methods=['POST'])
 def upload_backup():
     if 'backup_file' not in request.files:
         flash('No file part in the request.', 'error')
-        return redirect(url_for('backup_restore'))
+        return redirect(url_for('web.backup_restore'))
     
     file = request.files['backup_file']
     if file.filename == '':
         flash('No file selected for uploading.', 'error')
-        return redirect(url_for('backup_restore'))
+        return redirect(url_for('web.backup_restore'))
 
     if file and file.filename.endswith('.json'):
         try:
@@ -491,19 +878,193 @@ def upload_backup():
             # Validate that it's a valid JSON file
             json.loads(content)
             # Overwrite the config file
-            with open(CONFIG_FILE, 'w') as f:
-                f.write(content)
+            write_config_file(content)
+            apply_config_change()
             flash('Configuration restored successfully!', 'success')
         except Exception as e:
             flash(f'Error processing file: {e}', 'error')
     else:
         flash('Invalid file type. Please upload a .json file.', 'error')
 
-    return redirect(url_for('backup_restore'))
+    return redirect(url_for('web.backup_restore'))
+
+@web.route('/import', methods=['POST'])
+def bulk_import():
+    file = request.files.get('import_file')
+    if not file or file.filename == '':
+        flash('No file selected for importing.', 'error')
+        return redirect(url_for('web.backup_restore'))
+    try:
+        rows = parse_import_file(file.filename, file.read())
+    except Exception as e:
+        flash(f'Could not read {file.filename}: {e}', 'error')
+        return redirect(url_for('web.backup_restore'))
+    if not rows:
+        flash(f'No feeds found in {file.filename}.', 'error')
+        return redirect(url_for('web.backup_restore'))
+
+    defaults = feed_settings_from_form({**request.form.to_dict(), 'name': '', 'url': ''})
+    job = ImportJob(file.filename, rows, defaults, config_cache.get().get('FEEDS', []), merge_imported_feeds)
+    job.start()
+    return redirect(url_for('web.import_status', job_id=job.id))
+
+def merge_imported_feeds(feeds):
+    """Appends validated feeds to the current config. Returns how many were added."""
+    if feeds:
+        config = load_config()
+        config['FEEDS'].extend(feeds)
+        save_config(config)
+        apply_config_change()
+    return len(feeds)
+
+@web.route('/import/<job_id>')
+def import_status(job_id):
+    job = load_progress(job_id)
+    if job is None:
+        flash('Import not found.', 'error')
+        return redirect(url_for('web.backup_restore'))
+    return render_template("import_status.html", job=job)
+
+# --- JSON API ---
+# Read-only. Responses carry an ETag built from config.json's version and the
+# feed state revision, so polling clients get a cheap 304 until something changes.
+
+def api_etag():
+    version = f"{config_cache.version()}-{get_feed_state_store().revision()}"
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()[:20]
+
+def conditional_json(build):
+    """Answers 304 if the client's copy is current, otherwise the JSON from build()."""
+    etag = api_etag()
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def feed_with_state(feed, feed_state):
+    return dict(feed, state=feed_state.get(feed['id'], {}))
+
+@web.route('/api/feeds')
+def api_feeds():
+    def build():
+        config = config_cache.get()
+        revision = get_feed_state_store().revision()
+        feed_state = load_feed_state()
+        per_page = min(max(request.args.get('per_page', FEEDS_PER_PAGE, type=int), 1), MAX_FEEDS_PER_PAGE)
+        matched = query_feeds(config.get('FEEDS', []), feed_state, request.args.get('q', ''), request.args.get('status', ''),
+                              request.args.get('sort', ''), 'desc' if request.args.get('order') == 'desc' else 'asc')
+        feeds, page, pages = paginate(matched, request.args.get('page', 1, type=int), per_page)
+        return {
+            "feeds": [feed_with_state(feed, feed_state) for feed in feeds],
+            "page": page,
+            "pages": pages,
+            "per_page": per_page,
+            "matched": len(matched),
+            "total": len(config.get('FEEDS', [])),
+            "revision": revision, # Pass as ?since= to /api/events to follow changes from here.
+        }
+    return conditional_json(build)
+
+@web.route('/api/feeds/<feed_id>')
+def api_feed(feed_id):
+    feed = next((feed for feed in config_cache.get().get('FEEDS', []) if feed['id'] == feed_id), None)
+    if feed is None:
+        return jsonify(error="Feed not found."), 404
+    return conditional_json(lambda: feed_with_state(feed, {feed_id: get_feed_state_store().get(feed_id)}))
+
+@web.route('/api/feeds/<feed_id>/check', methods=['POST'])
+def api_check_feed(feed_id):
+    if not any(feed['id'] == feed_id for feed in config_cache.get().get('FEEDS', [])):
+        return jsonify(error="Feed not found."), 404
+    ok, message = check_feed_now(feed_id)
+    return jsonify(ok=ok, message=message), 202 if ok else 503
+
+event_streams = threading.BoundedSemaphore(MAX_EVENT_STREAMS) # Per worker process.
+
+@web.route('/api/events')
+def feed_events():
+    """
+    Server-sent events: one "state" event per feed state record the scheduler
+    writes, starting after ?since= (or the browser's Last-Event-ID on reconnect).
+    """
+    if not event_streams.acquire(blocking=False):
+        return jsonify(error="Too many open event streams, try again later."), 503, {'Retry-After': '60'}
+    try:
+        response = event_stream_response()
+    except BaseException:
+        event_streams.release() # The response that would have released it was never built.
+        raise
+    response.call_on_close(event_streams.release) # Also when the client goes away mid-stream.
+    return response
+
+def event_stream_response():
+    store = get_feed_state_store()
+    try:
+        revision = int(request.headers.get('Last-Event-ID') or request.args['since'])
+    except (KeyError, ValueError):
+        revision = store.revision()
+
+    def stream(revision):
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < SSE_STREAM_SECONDS:
+            latest, changed = store.changes_since(revision)
+            feed_ids = {feed['id'] for feed in config_cache.get().get('FEEDS', [])}
+            updates = [(feed_id, state) for feed_id, state in changed.items() if feed_id in feed_ids and state is not None]
+            for i, (feed_id, state) in enumerate(updates):
+                # The id goes on the last event of a batch, so a reconnect resumes after the whole batch.
+                event_id = f"id: {latest}\n" if i == len(updates) - 1 else ""
+                yield f"{event_id}event: state\ndata: {json.dumps({'feed_id': feed_id, 'state': state})}\n\n"
+            revision = latest
+            if updates:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(SSE_POLL_INTERVAL)
+
+    return Response(stream_with_context(stream(revision)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# --- App Factory ---
+
+def create_app():
+    """
+    Builds the app. Everything that reads or creates files, or compiles
+    templates, happens here and only once: with
+    `gunicorn --preload "main_web:create_app()"` that is in the master
+    process, and the forked workers share the result copy-on-write.
+    """
+    app = Flask(__name__)
+    app.secret_key = get_secret_key()
+    app.jinja_loader = DictLoader(PAGE_TEMPLATES)
+    for page_name in PAGE_TEMPLATES:
+        app.jinja_env.get_template(page_name)
+    app.register_blueprint(web)
+    initialize_files()
+    # Fill the caches up front, so workers don't each parse them on their first request.
+    config_cache.get()
+    user_cache.get()
+    load_feed_state()
+    return app
+
+_app = None
+
+def __getattr__(name):
+    # Keeps the old `gunicorn main_web:app` entry point working; the app is built on first access.
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
     print("This script is for the web UI and is not meant to be run directly for production.")
-    print("Use Gunicorn to serve the 'app' object in this file.")
-    print("Example: gunicorn --bind 0.0.0.0:5000 main_web:app")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    print("Use Gunicorn to serve the app built by create_app() in this file.")
+    print('Example: gunicorn --preload --bind 0.0.0.0:5000 "main_web:create_app()"')
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
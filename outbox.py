@@ -0,0 +1,130 @@
+# outbox.py
+# Durable queue of webhook posts. A new article is written here as pending
+# before the feed's high-water mark moves past it, and only removed once
+# Discord has accepted it, so posts survive a scheduler restart or crash.
+# Lives in feed_state.db, so sharded schedulers share it: whichever
+# instance holds a feed's lease delivers that feed's leftovers.
+
+import json
+import threading
+import time
+from state_store import FEED_STATE_DB, thread_connection
+
+# --- Configuration ---
+RETRY_DELAY = 60 # Seconds before a post that ran out of attempts is tried again.
+HANDOFF_DELAY = 60 # Seconds before a new post is due for redelivery; the scheduler hands it to the webhook workers itself.
+MAX_RETRY_DELAY = 3600
+MAX_OUTBOX_AGE = 24 * 3600 # Seconds a post keeps being retried before it is marked failed.
+FAILED_RETENTION = 7 * 24 * 3600 # Seconds failed posts are kept, so the same article isn't queued again.
+
+PENDING = "pending"
+FAILED = "failed"
+
+
+class OutboxItem:
+    """A post loaded from the outbox."""
+
+    def __init__(self, id, feed_id, article_id, webhook_url, payload, attempts):
+        self.id = id
+        self.feed_id = feed_id
+        self.article_id = article_id
+        self.webhook_url = webhook_url
+        self.payload = payload
+        self.attempts = attempts
+
+
+class DeliveryOutbox:
+    def __init__(self, path=FEED_STATE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS delivery_outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " feed_id TEXT NOT NULL,"
+            " article_id TEXT NOT NULL,"
+            " webhook_url TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL,"
+            " next_attempt REAL NOT NULL,"
+            " last_error TEXT,"
+            " UNIQUE (feed_id, article_id))"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS delivery_outbox_due ON delivery_outbox (status, next_attempt)")
+
+    def _conn(self):
+        return thread_connection(self._local, self.path)
+
+    def add(self, feed_id, article_id, webhook_url, payload, now=None, hold_until=None):
+        """
+        Records a post as pending, due at hold_until (digests) or after
+        HANDOFF_DELAY, so redelivery only picks it up if the first hand-off
+        was lost. Returns its id, or None if this article is already in the
+        outbox (queued, retrying or failed).
+        """
+        now = now or time.time()
+        cursor = self._conn().execute(
+            "INSERT OR IGNORE INTO delivery_outbox"
+            " (feed_id, article_id, webhook_url, payload, status, created, next_attempt)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (feed_id, article_id, webhook_url, json.dumps(payload), PENDING, now, hold_until or now + HANDOFF_DELAY),
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def due(self, now=None, limit=500):
+        """Pending posts whose next attempt is due, oldest first."""
+        rows = self._conn().execute(
+            "SELECT id, feed_id, article_id, webhook_url, payload, attempts FROM delivery_outbox"
+            " WHERE status = ? AND next_attempt <= ? ORDER BY id LIMIT ?",
+            (PENDING, now or time.time(), limit),
+        ).fetchall()
+        return [OutboxItem(row[0], row[1], row[2], row[3], json.loads(row[4]), row[5]) for row in rows]
+
+    def pending(self):
+        """Every pending post, due or held for a digest."""
+        return self.due(float('inf'), limit=-1)
+
+    def pending_feeds(self):
+        """feed_ids with posts still waiting in the outbox."""
+        return {row[0] for row in self._conn().execute(
+            "SELECT DISTINCT feed_id FROM delivery_outbox WHERE status = ?", (PENDING,))}
+
+    def complete(self, item_id):
+        self._conn().execute("DELETE FROM delivery_outbox WHERE id = ?", (item_id,))
+
+    def retry_later(self, item_id, error, now=None):
+        """
+        Schedules another attempt with a growing delay, or marks the post
+        failed once it has been retried for MAX_OUTBOX_AGE. Returns False if
+        the post was given up on.
+        """
+        now = now or time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT attempts, created FROM delivery_outbox WHERE id = ?", (item_id,)).fetchone()
+        if not row:
+            return False
+        attempts, created = row[0] + 1, row[1]
+        if now - created >= MAX_OUTBOX_AGE:
+            self.fail(item_id, error)
+            return False
+        delay = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (attempts - 1))
+        conn.execute("UPDATE delivery_outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                     (attempts, now + delay, error, item_id))
+        return True
+
+    def fail(self, item_id, error):
+        """Gives up on a post. It stays in the outbox so the article isn't queued again."""
+        self._conn().execute(
+            "UPDATE delivery_outbox SET status = ?, attempts = attempts + 1, last_error = ? WHERE id = ?",
+            (FAILED, error, item_id),
+        )
+
+    def forget_feed(self, feed_id):
+        self._conn().execute("DELETE FROM delivery_outbox WHERE feed_id = ?", (feed_id,))
+
+    def purge(self, now=None):
+        """Drops failed posts older than FAILED_RETENTION."""
+        now = now or time.time()
+        self._conn().execute("DELETE FROM delivery_outbox WHERE status = ? AND created < ?",
+                             (FAILED, now - FAILED_RETENTION))
@@ -0,0 +1,145 @@
+# profiler.py
+# On-demand sampling profiler for the scheduler. Nothing runs until a
+# profile is requested (SIGUSR1 by default); then a background thread
+# samples the stacks of every thread for a fixed window and writes them in
+# collapsed-stack format (one "frame;frame;frame count" line per stack,
+# ready for flamegraph.pl or speedscope), plus a short text summary.
+# Also summarizes per-stage timings from the shared metrics for each cycle.
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from metrics import (FETCH_PHASE_SECONDS, PARSE_SECONDS, PROCESS_SECONDS, DEDUP_LOCK_WAIT_SECONDS,
+                     STATE_WRITE_SECONDS, WEBHOOK_SECONDS)
+
+# --- Configuration ---
+PROFILE_DIR = "profiles"
+PROFILE_SECONDS = 30 # Length of one profiling run.
+SAMPLE_INTERVAL = 0.01 # Seconds between stack samples (100 Hz).
+MAX_STACK_DEPTH = 64
+TOP_FUNCTIONS = 25 # Functions listed in the text summary.
+
+# Stages reported in timing summaries: (label, histogram).
+TIMED_STAGES = (
+    ("fetch", FETCH_PHASE_SECONDS),
+    ("parse", PARSE_SECONDS),
+    ("process", PROCESS_SECONDS),
+    ("dedup lock wait", DEDUP_LOCK_WAIT_SECONDS),
+    ("state writes", STATE_WRITE_SECONDS),
+    ("webhooks", WEBHOOK_SECONDS),
+)
+
+
+# --- Timing Summaries ---
+
+class CycleTimings:
+    """Seconds spent per stage since the previous call to take()."""
+
+    def __init__(self):
+        self._last = self._totals()
+        self._last_time = time.monotonic()
+
+    def _totals(self):
+        return {label: histogram.totals() for label, histogram in TIMED_STAGES}
+
+    def take(self):
+        """Returns {"seconds": wall time, stage: (count, seconds), ...} and starts a new cycle."""
+        totals, now = self._totals(), time.monotonic()
+        summary = {"seconds": now - self._last_time}
+        for label, (count, seconds) in totals.items():
+            last_count, last_seconds = self._last[label]
+            summary[label] = (count - last_count, seconds - last_seconds)
+        self._last, self._last_time = totals, now
+        return summary
+
+
+def format_timings(summary):
+    stages = ", ".join(f"{label} {summary[label][1]:.2f}s/{summary[label][0]}" for label, _ in TIMED_STAGES)
+    return f"{summary['seconds']:.0f}s wall: {stages}"
+
+
+# --- Stack Sampling ---
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_group(name):
+    # "feed-worker_3" and "feed-worker_5" are folded into one root.
+    return re.sub(r"[-_]\d+$", "", name)
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, seconds=PROFILE_SECONDS):
+        """Starts a profiling run in the background. Returns False if one is already running."""
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._thread = threading.Thread(target=self._run, args=(seconds,), name="profiler", daemon=True)
+            self._thread.start()
+        return True
+
+    def _run(self, seconds):
+        try:
+            print(f"Profiling for {seconds}s...")
+            timings = CycleTimings()
+            stacks, samples = self._sample(seconds)
+            path = self._write(stacks, samples, timings.take())
+            print(f"Profile written to {path}")
+        except Exception as e:
+            print(f"Profiling failed: {e}")
+        finally:
+            with self._lock:
+                self._thread = None
+
+    def _sample(self, seconds):
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                frames = []
+                while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                    frames.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                frames.append(_thread_group(names.get(ident, f"thread-{ident}")))
+                stacks[";".join(reversed(frames))] += 1
+            samples += 1
+            time.sleep(self.interval)
+        return stacks, samples
+
+    def _write(self, stacks, samples, timings):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"scheduler-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        with open(base + ".folded", "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Time per function, where it was on top of the stack (self) or anywhere on it (total).
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        with open(base + ".txt", "w") as f:
+            f.write(f"{samples} samples every {self.interval * 1000:.0f}ms across all threads (wall clock, idle threads included)\n")
+            f.write(f"Stage timings: {format_timings(timings)}\n\n")
+            f.write(f"{'self':>8} {'total':>8}  function\n")
+            for frame, count in self_counts.most_common(TOP_FUNCTIONS):
+                f.write(f"{count:>8} {total_counts[frame]:>8}  {frame}\n")
+        return base + ".folded"
@@ -3,26 +3,186 @@
 
 import os
 import asyncio
-import feedparser
-import yaml
+import aiohttp
+import hashlib
+import heapq
 import json
-import threading
+import math
+import multiprocessing
+import random
 import requests
+import signal
+import threading
 import time
-from datetime import datetime, timezone, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit
+from dedup_store import open_dedup_store
+from feed_parser import newest_first, parse_feed
+from fetch import (FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT, FETCH_TIMEOUT, MAX_FEED_BYTES, USER_AGENT, FeedTooLarge,
+                   download_feed)
+from file_cache import CachedJSONFile
+from state_store import get_feed_state_store
+from sharding import ShardCoordinator
+from delivery import WebhookDispatcher
+from outbox import DeliveryOutbox, OutboxItem
+from profiler import SamplingProfiler, CycleTimings, format_timings, PROFILE_SECONDS
+from control import start_control_server, stop_control_server
+from fingerprints import RotatingBloomFilter, story_fingerprints
+from metrics import (FETCH_PHASE_SECONDS, FETCHES, PARSE_SECONDS, PROCESS_SECONDS, ENTRIES_SCANNED,
+                     FEED_STAGE_SECONDS, WATCHDOG_RECLAIMS, start_metrics_server)
 
-# --- Configuration & State Files ---
+# --- Configuration File ---
 CONFIG_FILE = "config.json"
-SENT_ARTICLES_FILE = "sent_articles.yaml"
-FEED_STATE_FILE = "feed_state.json"
-MAX_SENT_ARTICLES = 10000 # The maximum number of article IDs to store.
 
-# --- Threading Lock ---
-# This lock prevents race conditions when multiple threads access the sent_articles file.
-file_lock = threading.Lock()
+# --- Dedup Store ---
+# Opened once by get_sent_store(); it has its own lock and an in-memory index.
+_sent_store = None
+_sent_store_lock = threading.Lock()
+
+def get_sent_store():
+    global _sent_store
+    with _sent_store_lock:
+        if _sent_store is None:
+            _sent_store = open_dedup_store()
+        return _sent_store
+
+# --- Webhook Delivery ---
+# New posts are recorded in the outbox first, then handed to per-webhook
+# queues that handle Discord's rate limits and retries.
+webhook_dispatcher = WebhookDispatcher()
+_outbox = None
+_outbox_lock = threading.Lock()
+
+def get_outbox():
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = DeliveryOutbox()
+        return _outbox
+
+# --- Cross-Feed Duplicates ---
+# Fingerprints of every story posted, per webhook; saved to disk every cycle.
+# Stories still waiting in the outbox are reserved here in memory, so a second
+# feed can't queue a story while the first feed's post is on its way.
+_fingerprint_filter = None
+_fingerprint_filter_lock = threading.Lock()
+_pending_fingerprints = {} # fingerprint -> set of (feed_id, article_id) of the queued posts carrying it
+_reserved_fingerprints = {} # (feed_id, article_id) -> fingerprints it reserved
+_pending_fingerprints_lock = threading.Lock()
+
+def get_fingerprint_filter():
+    global _fingerprint_filter
+    with _fingerprint_filter_lock:
+        if _fingerprint_filter is None:
+            _fingerprint_filter = RotatingBloomFilter()
+            _fingerprint_filter.load()
+        return _fingerprint_filter
+
+def reserve_fingerprints(key, fingerprints):
+    """Marks a queued post's story as on its way. Caller holds _pending_fingerprints_lock."""
+    drop_reservation(key) # Its webhook may have been edited since it was last reserved.
+    _reserved_fingerprints[key] = fingerprints
+    for fingerprint in fingerprints:
+        _pending_fingerprints.setdefault(fingerprint, set()).add(key)
+
+def drop_reservation(key):
+    # Caller holds _pending_fingerprints_lock.
+    for fingerprint in _reserved_fingerprints.pop(key, ()):
+        owners = _pending_fingerprints[fingerprint]
+        owners.discard(key)
+        if not owners:
+            del _pending_fingerprints[fingerprint]
+
+def release_fingerprints(keys):
+    """Drops the reservations of posts that were delivered, given up on or forgotten."""
+    with _pending_fingerprints_lock:
+        for key in keys:
+            drop_reservation(key)
+
+def release_deleted_fingerprints(configured):
+    """Drops the reservations of posts whose feed is no longer in config.json."""
+    with _pending_fingerprints_lock:
+        keys = [key for key in _reserved_fingerprints if key[0] not in configured]
+    release_fingerprints(keys)
+
+def reserve_outbox_fingerprints(items):
+    """Reserves the stories of posts already in the outbox, left by an earlier run or another instance."""
+    with _pending_fingerprints_lock:
+        for item in items:
+            embed = item.payload['embeds'][0]
+            reserve_fingerprints((item.feed_id, item.article_id),
+                                 story_fingerprints(item.webhook_url, embed.get('url'), embed.get('title')))
+
+# --- Digests ---
+# Feeds with "digest" set in config.json hold new entries in the outbox for up
+# to "digest_window" seconds, then post everything due for a webhook together:
+# "embeds" as messages of up to 10 embeds, "summary" as one embed listing links.
+DIGEST_MODES = ("embeds", "summary")
+DEFAULT_DIGEST_WINDOW = 300
+MAX_EMBEDS_PER_MESSAGE = 10 # Discord's limits for one webhook message.
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_EMBED_DESCRIPTION = 4096
 
-# --- Set a common User-Agent for all feedparser requests ---
-feedparser.USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/116.0"
+# --- Fetch Engine Settings ---
+MAX_CONCURRENT_FETCHES = 50 # Upper bound on simultaneous feed downloads (and open sockets).
+MAX_CONNECTIONS_PER_HOST = 4 # Keeps many feeds on one host from hogging the pool.
+KEEPALIVE_TIMEOUT = 60 # Seconds an idle pooled connection is kept open.
+PROCESS_WORKERS = 8 # Threads that hand fetched feeds to the parsers and post new entries.
+MAX_BUFFERED_FEEDS = 64 # Downloaded feed bodies held in memory at once, including those waiting for a thread above.
+PARSE_WORKERS = os.cpu_count() or 1 # Processes running feedparser. Set to 0 to parse in the threads above.
+PARSE_TIMEOUT = 60 # Seconds a parser process may spend on one feed before it is killed.
+
+# --- Sharding ---
+# Set SHARDING to True to run several copies of this script against the same
+# directory; feeds are split between the running instances and rebalanced
+# when one starts or stops. Needs the sqlite dedup backend.
+SHARDING = False
+SHARD_HEARTBEAT_INTERVAL = 10 # Seconds between heartbeats (must be well under sharding.INSTANCE_TTL).
+LEASE_RETRY_DELAY = 15 # Seconds before retrying a feed whose lease another instance still holds.
+
+# --- Watchdog ---
+WATCHDOG_INTERVAL = 30 # Seconds between checks for stuck feed checks.
+WATCHDOG_STUCK_AFTER = FETCH_TIMEOUT + PARSE_TIMEOUT + 120 # A check running longer than this is reclaimed.
+
+# Errors recorded in a feed's state record and shown in the web UI.
+FETCH_TIMED_OUT = "timeout"
+PARSE_TIMED_OUT = "parse timeout"
+CHECK_STUCK = "stuck, reclaimed by watchdog"
+
+# --- Profiling ---
+# `kill -USR1 <pid>` samples every scheduler thread for profiler.PROFILE_SECONDS
+# and writes a collapsed-stack file to profiles/. Nothing runs until then.
+# `python control.py profile [seconds]` does the same over the control socket.
+PROFILE_SIGNAL = getattr(signal, "SIGUSR1", None)
+
+# --- Metrics Endpoint ---
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108 # Prometheus /metrics for the scheduler. Set to None to disable.
+
+# --- Scheduling Settings ---
+CONFIG_RELOAD_INTERVAL = 60 # Seconds between full resyncs of config and feed state (and housekeeping).
+CONFIG_WATCH_INTERVAL = 2 # Seconds between checking whether config.json changed on disk.
+OUTBOX_POLL_INTERVAL = 15 # Seconds between looking for outbox posts to (re)deliver.
+STARTUP_SPREAD = 120 # Overdue feeds are spread over up to this many seconds after a restart.
+SCHEDULE_JITTER = 0.1 # Each poll is delayed by up to this fraction of the feed's interval.
+FANOUT_WINDOW = 60 # Feeds sharing a URL that are due within this many seconds share one fetch.
+RECENT_ENTRY_WINDOW = 24 * 3600 # Only entries published within this many seconds are posted.
+
+# --- Adaptive Polling ---
+# Feeds with "adaptive": true in config.json poll between their min_interval and
+# max_interval, based on how often they actually publish.
+DEFAULT_MIN_INTERVAL = 60
+DEFAULT_MAX_INTERVAL = 6 * 3600
+ADAPTIVE_SPEEDUP = 0.75 # Interval multiplier after a poll that found new entries.
+ADAPTIVE_SLOWDOWN = 1.25 # Interval multiplier after a poll that found nothing new.
+PUBLISH_GAP_SMOOTHING = 0.3 # Weight of the newest sample in the average gap between entries.
+PARK_AFTER_FAILURES = 10 # Consecutive failures before a feed is parked.
+PARKED_INTERVAL = 24 * 3600 # Parked feeds are only retried this often.
+ADAPTIVE_FIELDS = ('parked', 'next_interval', 'learned_interval') # State kept only while a feed is adaptive.
+
+# --- Set a common User-Agent for all feed requests ---
 
 def initialize_files():
     """Ensure all necessary files exist before the app starts."""
@@ -30,179 +190,860 @@ def initialize_files():
         with open(CONFIG_FILE, 'w') as f:
             json.dump({"FEEDS": []}, f)
         print(f"Created default {CONFIG_FILE}")
-    if not os.path.exists(SENT_ARTICLES_FILE):
-        with open(SENT_ARTICLES_FILE, 'w') as f:
-            yaml.dump([], f)
-        print(f"Created default {SENT_ARTICLES_FILE}")
-    if not os.path.exists(FEED_STATE_FILE):
-        with open(FEED_STATE_FILE, 'w') as f:
-            json.dump({}, f)
-        print(f"Created default {FEED_STATE_FILE}")
+    # Creates feed_state.db, importing an existing feed_state.json.
+    get_feed_state_store()
 
-def load_config():
-    with open(CONFIG_FILE, 'r') as f:
-        content = f.read()
-        if not content:
-            return {"FEEDS": []}
-        return json.loads(content)
+# Only re-parsed when it changes on disk. The returned object is shared, so treat it as read-only.
+config_cache = CachedJSONFile(CONFIG_FILE, default={"FEEDS": []})
 
-def save_feed_state(feed_state):
-     with open(FEED_STATE_FILE, 'w') as f:
-        json.dump(feed_state, f, indent=4)
+def load_config():
+    return config_cache.get()
 
 def load_feed_state():
-    with open(FEED_STATE_FILE, 'r') as f:
-        content = f.read()
-        if not content:
-            return {}
-        return json.loads(content)
+    """A fresh {feed_id: state} dict read from the feed state store."""
+    return get_feed_state_store().get_all()
+
+def make_fetch_trace_config():
+    """aiohttp hooks that record DNS and connect time for every feed request."""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_dns_start(session, ctx, params):
+        ctx.dns_started = time.perf_counter()
 
-def post_if_new(article_id, entry, feed_data, webhook_url):
+    async def on_dns_end(session, ctx, params):
+        FETCH_PHASE_SECONDS.observe(time.perf_counter() - ctx.dns_started, phase="dns")
+
+    async def on_connect_start(session, ctx, params):
+        ctx.connect_started = time.perf_counter()
+
+    async def on_connect_end(session, ctx, params):
+        FETCH_PHASE_SECONDS.observe(time.perf_counter() - ctx.connect_started, phase="connect")
+
+    trace_config.on_dns_resolvehost_start.append(on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_end)
+    trace_config.on_connection_create_start.append(on_connect_start)
+    trace_config.on_connection_create_end.append(on_connect_end)
+    return trace_config
+
+def effective_interval(feed_config, state_entry):
+    """Seconds until a feed should be polled again, honouring adaptive mode and parking."""
+    if not feed_config.get('adaptive'):
+        return feed_config['update_interval']
+    if state_entry.get('parked'):
+        return PARKED_INTERVAL
+    return state_entry.get('next_interval') or feed_config['update_interval']
+
+def adapt_interval(feed_config, previous_state, state):
     """
-    Atomically checks if an article is new and posts it as an embed if so.
+    Works out the polling fields for a finished check: the failure streak
+    and, for adaptive feeds, the learned interval, exponential error backoff
+    and parking. Fields set to None are to be removed from the state.
     """
-    with file_lock:
-        sent_articles_list = []
-        try:
-            with open(SENT_ARTICLES_FILE, 'r') as f:
-                content = f.read()
-                if content:
-                    sent_articles_list = yaml.safe_load(content) or []
-        except FileNotFoundError:
-            pass
-
-        sent_articles_set = set(sent_articles_list)
-
-        if article_id not in sent_articles_set:
-            print(f"New article found, posting: {entry.title}")
-            
-            # Create the Discord embed payload
-            description = entry.get('summary', 'No description available.')
-            # Simple HTML tag removal and truncation
-            description = description.split('<')[0]
-            if len(description) > 400:
-                description = description[:400].rsplit(' ', 1)[0] + '...'
-
-            embed = {
-                "title": entry.get('title', 'No Title'),
-                "url": entry.get('link', ''),
-                "description": description,
-                "color": 5814783,  # A nice blue color (#58A6FF)
-                "footer": {
-                    "text": feed_data.feed.title
-                },
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            payload = {"embeds": [embed]}
-
-            response = requests.post(webhook_url, json=payload)
-            
-            if response.status_code < 400:
-                sent_articles_list.append(article_id)
-                if len(sent_articles_list) > MAX_SENT_ARTICLES:
-                    sent_articles_list = sent_articles_list[-MAX_SENT_ARTICLES:]
-                
-                with open(SENT_ARTICLES_FILE, 'w') as f:
-                    yaml.dump(sent_articles_list, f)
-                return True
-            else:
-                print(f"Error sending embed to webhook: {response.status_code} {response.text}")
-                return False
+    status_code = state.get('status_code')
+    failed = status_code is None or status_code >= 400
+    streak = previous_state.get('failure_streak', 0) + 1 if failed else 0
+    update = {'failure_streak': streak}
+    if not feed_config.get('adaptive'):
+        # Adaptive mode was never on or was turned off: forget what it learned.
+        update.update(dict.fromkeys(ADAPTIVE_FIELDS))
+        return update
+
+    min_interval = feed_config.get('min_interval') or DEFAULT_MIN_INTERVAL
+    max_interval = max(min_interval, feed_config.get('max_interval') or DEFAULT_MAX_INTERVAL)
+    learned = previous_state.get('learned_interval') or feed_config['update_interval']
+
+    if failed:
+        update['parked'] = streak >= PARK_AFTER_FAILURES
+        update['next_interval'] = min(max_interval, learned * 2 ** streak)
+        return update
+
+    found_new = state.get('newest_entry_id') != previous_state.get('newest_entry_id')
+    learned *= ADAPTIVE_SPEEDUP if found_new else ADAPTIVE_SLOWDOWN
+    publish_gap = state.get('publish_gap')
+    if publish_gap:
+        # Pull towards polling about twice per publishing gap.
+        learned = (learned + publish_gap / 2) / 2
+    learned = int(min(max_interval, max(min_interval, learned)))
+    update['learned_interval'] = learned
+    update['next_interval'] = learned
+    update['parked'] = False
+    return update
+
+def normalize_feed_url(url):
+    """Canonical form of a feed URL, used to fetch feeds shared by several entries only once."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+def describe_fetch_error(e):
+    """Short description of a failed download, as stored in the feed's state record."""
+    if isinstance(e, (asyncio.TimeoutError, requests.Timeout)):
+        return FETCH_TIMED_OUT
+    if isinstance(e, FeedTooLarge):
+        return f"too large (over {MAX_FEED_BYTES} bytes)"
+    return repr(e)[:200]
+
+def post_if_new(feed_config, article_id, entry, feed_title):
+    """
+    Checks if an article is new for this feed and queues it for posting as an embed if so.
+    The post is written to the outbox before anything else, so it is delivered
+    even if the scheduler restarts; the article is recorded as sent once the
+    webhook accepts it. Feeds with "suppress_duplicates" skip stories another
+    feed already posted to the same webhook; digest feeds hold the post for
+    the next digest.
+    """
+    feed_id, webhook_url = feed_config['id'], feed_config['webhook_url']
+    if get_sent_store().contains(feed_id, article_id):
         return False
 
+    # Create the Discord embed payload. The description was already trimmed by the parser.
+    embed = {
+        "title": entry.title,
+        "url": entry.link,
+        "description": entry.description,
+        "color": 5814783,  # A nice blue color (#58A6FF)
+        "footer": {
+            "text": feed_title
+        },
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    payload = {"embeds": [embed]}
+
+    hold_until = None
+    if feed_config.get('digest') in DIGEST_MODES:
+        # Due at the end of the current window, so everything collected for the webhook goes out together.
+        window = max(1, int(feed_config.get('digest_window') or DEFAULT_DIGEST_WINDOW))
+        hold_until = math.ceil(time.time() / window) * window
+
+    # Checked and reserved in one step, so two feeds queueing the same story at
+    # once can't both post it. A reservation only becomes a fingerprint in the
+    # filter once Discord accepts the post (see submit_delivery).
+    fingerprints = story_fingerprints(webhook_url, entry.link, entry.title)
+    with _pending_fingerprints_lock:
+        if feed_config.get('suppress_duplicates') and (
+                any(fingerprint in _pending_fingerprints for fingerprint in fingerprints)
+                or get_fingerprint_filter().contains(fingerprints)):
+            print(f"Skipping story already posted to this webhook: {entry.title}")
+            get_sent_store().add(feed_id, article_id)
+            return False
+        item_id = get_outbox().add(feed_id, article_id, webhook_url, payload, hold_until=hold_until)
+        if item_id is None:
+            return False # Already waiting in the outbox.
+        reserve_fingerprints((feed_id, article_id), fingerprints)
+
+    if hold_until:
+        print(f"New article found, holding for the next digest: {entry.title}")
+        return True
+    print(f"New article found, posting: {entry.title}")
+    return submit_delivery([OutboxItem(item_id, feed_id, article_id, webhook_url, payload, 0)], payload)
+
+def submit_delivery(items, payload):
+    """
+    Hands a message carrying outbox posts to the webhook workers, which settle
+    them in the outbox when done. Delivered stories are fingerprinted for
+    every feed, so feeds that suppress duplicates can match against all of them.
+    """
+    def delivered():
+        for item in items:
+            embed = item.payload['embeds'][0]
+            get_fingerprint_filter().add(story_fingerprints(item.webhook_url, embed.get('url'), embed.get('title')))
+            get_sent_store().add(item.feed_id, item.article_id)
+            get_outbox().complete(item.id)
+        release_fingerprints([(item.feed_id, item.article_id) for item in items])
+
+    def failed(error, retryable):
+        given_up = []
+        for item in items:
+            if retryable:
+                still_queued = get_outbox().retry_later(item.id, error)
+            else:
+                get_outbox().fail(item.id, error)
+                still_queued = False
+            if not still_queued:
+                given_up.append((item.feed_id, item.article_id))
+        release_fingerprints(given_up) # A story that won't be posted doesn't hold off other feeds.
+
+    return webhook_dispatcher.submit(items[0].webhook_url, payload, keys=[(item.feed_id, item.article_id) for item in items],
+                                     on_success=delivered, on_failure=failed)
+
+def embed_chars(embed):
+    """Characters Discord counts towards its per-message embed limit."""
+    return sum(len(text or '') for text in (embed.get('title'), embed.get('description'), embed.get('footer', {}).get('text')))
+
+def digest_messages(items, mode):
+    """
+    Packs held outbox posts for one webhook into as few messages as Discord
+    allows. Yields (payload, items in that message).
+    """
+    if mode == "embeds":
+        batch, chars = [], 0
+        for item in items:
+            embed = item.payload['embeds'][0]
+            if batch and (len(batch) >= MAX_EMBEDS_PER_MESSAGE or chars + embed_chars(embed) > MAX_EMBED_CHARS_PER_MESSAGE):
+                yield {"embeds": [i.payload['embeds'][0] for i in batch]}, batch
+                batch, chars = [], 0
+            batch.append(item)
+            chars += embed_chars(embed)
+        if batch:
+            yield {"embeds": [i.payload['embeds'][0] for i in batch]}, batch
+        return
+
+    # "summary": one embed listing every entry as a link.
+    batch, lines = [], []
+    for item in items:
+        embed = item.payload['embeds'][0]
+        title = (embed.get('title') or 'No Title').replace('[', '(').replace(']', ')')
+        line = f"• [{title}]({embed.get('url', '')})"
+        if batch and sum(len(l) + 1 for l in lines) + len(line) > MAX_EMBED_DESCRIPTION:
+            yield summary_payload(batch, lines), batch
+            batch, lines = [], []
+        batch.append(item)
+        lines.append(line[:MAX_EMBED_DESCRIPTION])
+    if batch:
+        yield summary_payload(batch, lines), batch
+
+def summary_payload(items, lines):
+    sources = sorted({item.payload['embeds'][0].get('footer', {}).get('text') or '' for item in items} - {''})
+    return {"embeds": [{
+        "title": f"{len(items)} new article{'s' if len(items) != 1 else ''}",
+        "description": "\n".join(lines),
+        "color": 5814783,
+        "footer": {"text": ", ".join(sources)[:2048]},
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }]}
+
 class FeedScheduler:
     def __init__(self):
         self._is_running = True
+        self._feeds = {} # feed_id -> feed config from the last config load
+        self._feeds_by_url = {} # normalized URL -> feed_ids subscribed to it
+        self._configured = set() # feed_ids in config.json as of the last sync, on any shard
+        self._feed_state = {} # feed_id -> latest feed_state.json record
+        self._schedule = [] # heap of (due_timestamp, feed_id)
+        self._next_due = {} # feed_id -> due timestamp of its live heap entry
+        self._in_flight = set() # feed_ids currently being fetched/processed
+        self._tasks = {} # asyncio task -> (started, subscriptions)
+        self._check_futures = {} # asyncio task -> its check_feed_group future in the feed workers
+        self._parse_pool = None
+        self._parse_pool_lock = threading.Lock()
+        self._shards = None # ShardCoordinator when SHARDING is on
+        self._cycle_timings = CycleTimings()
+        self._config_version = None # config_cache.version() as of the last sync
+        self._wake = None # asyncio.Event set to run the loop before its next timer
+        self.profiler = SamplingProfiler()
 
     def stop(self):
         self._is_running = False
 
     def run(self):
         print("Scheduler started.")
-        while self._is_running:
-            print("Scheduler running check...")
-            config = load_config()
-            feed_state = load_feed_state()
-            now = datetime.now(timezone.utc)
-
-            for feed_config in config.get("FEEDS", []):
-                feed_id = feed_config['id']
-                state_entry = feed_state.get(feed_id, {})
-                last_checked_str = state_entry.get('last_checked')
-                last_checked = datetime.fromisoformat(last_checked_str) if last_checked_str else None
-                
-                is_initial_check = not last_checked
-
-                if is_initial_check or (now - last_checked).total_seconds() >= feed_config['update_interval']:
-                    print(f"Processing feed: {feed_config['url']}")
-                    threading.Thread(target=self.check_single_feed, args=(feed_config, is_initial_check), daemon=True).start()
-            
-            time.sleep(60)
+        asyncio.run(self.run_async())
         print("Scheduler stopped.")
 
-    def check_single_feed(self, feed_config, initial_check=False):
-        status_code = None
+    async def run_async(self):
+        """
+        Main loop. Feeds sit in a heap ordered by their next due time and are
+        dispatched as asyncio tasks over a shared, pooled HTTP session; posting
+        is handed to a fixed-size thread pool and parsing to worker processes.
+        """
+        self._fetch_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+        self._buffer_semaphore = asyncio.Semaphore(MAX_BUFFERED_FEEDS)
+        self._executor = ThreadPoolExecutor(max_workers=PROCESS_WORKERS, thread_name_prefix="feed-worker")
+        if PARSE_WORKERS:
+            self._parse_pool = self.start_parse_pool()
+        reserve_outbox_fingerprints(get_outbox().pending())
+        if SHARDING:
+            if not get_sent_store().shared:
+                raise RuntimeError("Sharding needs a dedup backend that can be shared between processes (sqlite).")
+            self._shards = ShardCoordinator()
+            self._shards.heartbeat()
+            print(f"Running as shard {self._shards.instance_id}.")
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONCURRENT_FETCHES,
+            limit_per_host=MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        timeout = aiohttp.ClientTimeout(total=FETCH_TIMEOUT, sock_connect=FETCH_CONNECT_TIMEOUT, sock_read=FETCH_READ_TIMEOUT)
+        self._wake = asyncio.Event()
+        control_server, control_path = await start_control_server(self.handle_control_command)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"User-Agent": USER_AGENT},
+                                         trace_configs=[make_fetch_trace_config()]) as session:
+            self._session = session
+            next_sync = 0
+            next_config_watch = time.time() + CONFIG_WATCH_INTERVAL
+            next_watchdog = time.time() + WATCHDOG_INTERVAL
+            next_redeliver = 0
+            next_heartbeat = time.time() + SHARD_HEARTBEAT_INTERVAL if self._shards else float('inf')
+            startup = True
+            while self._is_running:
+                self._wake.clear()
+                now = time.time()
+                if now >= next_heartbeat:
+                    if self._shards.heartbeat(now):
+                        next_sync = now # Membership changed: pick up or drop feeds right away.
+                    self.release_leases()
+                    next_heartbeat = now + SHARD_HEARTBEAT_INTERVAL
+                if now >= next_sync:
+                    print("Scheduler running check...")
+                    if not startup:
+                        print(f"Last cycle: {format_timings(self._cycle_timings.take())}")
+                    get_sent_store().expire()
+                    get_outbox().purge()
+                    get_fingerprint_filter().save()
+                    self.sync_feeds(now, startup)
+                    startup = False
+                    next_sync = now + CONFIG_RELOAD_INTERVAL
+                    next_config_watch = now + CONFIG_WATCH_INTERVAL
+                if now >= next_config_watch:
+                    if config_cache.version() != self._config_version:
+                        print("config.json changed, reloading feeds.")
+                        self.sync_feeds(now)
+                    next_config_watch = now + CONFIG_WATCH_INTERVAL
+                if now >= next_watchdog:
+                    self.reclaim_stuck_checks(now)
+                    next_watchdog = now + WATCHDOG_INTERVAL
+                if now >= next_redeliver:
+                    self.redeliver(now)
+                    next_redeliver = now + OUTBOX_POLL_INTERVAL
+
+                while self._schedule and self._schedule[0][0] <= now:
+                    due, feed_id = heapq.heappop(self._schedule)
+                    if self._next_due.get(feed_id) != due:
+                        continue # Superseded by a reschedule or the feed was removed.
+                    del self._next_due[feed_id]
+                    self.dispatch_feed(feed_id)
+
+                next_wake = min(next_sync, next_config_watch, next_watchdog, next_heartbeat, next_redeliver)
+                if self._schedule:
+                    next_wake = min(next_wake, self._schedule[0][0])
+                try:
+                    # Control commands set self._wake to dispatch what they scheduled at once.
+                    await asyncio.wait_for(self._wake.wait(), max(0, next_wake - time.time()))
+                except asyncio.TimeoutError:
+                    pass
+        await stop_control_server(control_server, control_path)
+        self._executor.shutdown(wait=False)
+        get_fingerprint_filter().save()
+        if self._shards:
+            self._shards.leave()
+            self._shards = None
+        if self._parse_pool:
+            self._parse_pool.shutdown()
+            self._parse_pool = None
+
+    def start_parse_pool(self):
+        # "spawn" because this process already runs threads, which forking doesn't mix well with.
+        return ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+    def parse_content(self, content, headers):
+        """Parses feed bytes in a worker process (or in this thread if there's no pool)."""
+        pool = self._parse_pool
+        if pool is None:
+            return parse_feed(content, headers)
         try:
-            feed_data = feedparser.parse(feed_config['url'])
-            status_code = feed_data.get('status', 500)
-            if feed_data.bozo:
-                print(f"Warning: Feed {feed_config['url']} may be malformed.")
-
-            now = datetime.now(timezone.utc)
-            time_cutoff = now - timedelta(hours=24)
-            
-            recent_entries = []
-            for entry in feed_data.entries:
-                published_time = None
-                if 'published_parsed' in entry and entry.published_parsed:
-                    published_time = datetime.fromtimestamp(time.mktime(entry.published_parsed), tz=timezone.utc)
-                elif 'updated_parsed' in entry and entry.updated_parsed:
-                    published_time = datetime.fromtimestamp(time.mktime(entry.updated_parsed), tz=timezone.utc)
-
-                if published_time and published_time > time_cutoff:
-                    recent_entries.append(entry)
-
-            if initial_check:
-                if recent_entries:
-                    latest_entry = recent_entries[0]
-                    article_id = latest_entry.get('id', latest_entry.link)
-                    post_if_new(article_id, latest_entry, feed_data, feed_config['webhook_url'])
-
-                    all_recent_ids = {entry.get('id', entry.link) for entry in recent_entries}
-                    with file_lock:
-                        sent_articles_list = []
-                        try:
-                            with open(SENT_ARTICLES_FILE, 'r') as f:
-                                content = f.read()
-                                if content: sent_articles_list = yaml.safe_load(content) or []
-                        except FileNotFoundError: pass
-                        sent_articles_set = set(sent_articles_list)
-                        sent_articles_set.update(all_recent_ids)
-                        final_list = list(sent_articles_set)
-                        if len(final_list) > MAX_SENT_ARTICLES:
-                            final_list = final_list[-MAX_SENT_ARTICLES:]
-                        with open(SENT_ARTICLES_FILE, 'w') as f:
-                            yaml.dump(final_list, f)
+            return pool.submit(parse_feed, content, headers).result(timeout=PARSE_TIMEOUT)
+        except FutureTimeoutError:
+            # The worker is stuck on this feed. Kill the pool's processes to get it back;
+            # parses running alongside it fail too and are retried on their next poll.
+            self.restart_parse_pool(pool, "A feed parser process timed out", terminate=True)
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool and let this check fail.
+            self.restart_parse_pool(pool, "A feed parser process died")
+            raise
+
+    def restart_parse_pool(self, pool, reason, terminate=False):
+        with self._parse_pool_lock:
+            if self._parse_pool is not pool:
+                return # Another thread already replaced it.
+            print(f"{reason}; restarting the parser pool.")
+            WATCHDOG_RECLAIMS.inc(stage="parse")
+            self._parse_pool = self.start_parse_pool()
+        if terminate:
+            # ProcessPoolExecutor has no public way to stop a busy worker.
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False)
+
+    def reclaim_stuck_checks(self, now):
+        """
+        Watchdog: cancels feed checks that have run far longer than their
+        timeouts allow and counts a timeout against each feed. A stuck
+        download is rescheduled at once; a check stuck in a feed worker keeps
+        its feeds in flight until the thread returns (see run_feed_group).
+        """
+        stuck = [(task, started, subscriptions) for task, (started, subscriptions) in self._tasks.items()
+                 if now - started > WATCHDOG_STUCK_AFTER]
+        if not stuck:
+            return
+        print(f"Watchdog: {len(stuck)} stuck feed check(s), {len(self._tasks)} running, "
+              f"{threading.active_count()} threads.")
+        state_store = get_feed_state_store()
+        for task, started, subscriptions in stuck:
+            print(f"Watchdog: reclaiming check of {subscriptions[0][0]['url']} after {int(now - started)}s")
+            WATCHDOG_RECLAIMS.inc(stage="check")
+            for feed_config, _, _ in subscriptions:
+                state = state_store.get(feed_config['id'])
+                state_store.update(feed_config['id'], error=CHECK_STUCK, timeouts=state.get('timeouts', 0) + 1)
+            del self._tasks[task]
+            task.cancel()
+
+    def release_leases(self):
+        """
+        Hands back leases on feeds this instance no longer owns, once nothing
+        for them is still being checked or waiting to be posted.
+        """
+        pending_feeds = {key[0] for key in webhook_dispatcher.pending_keys() if isinstance(key, tuple)}
+        self._shards.release([feed_id for feed_id in self._shards.held
+                              if feed_id not in self._feeds and feed_id not in self._in_flight
+                              and feed_id not in pending_feeds])
+
+    def redeliver(self, now):
+        """
+        Hands due outbox posts to the webhook workers: posts left over from a
+        restart, retries, and the leftovers of feeds taken over from another
+        instance.
+        """
+        digests = {} # (webhook_url, mode) -> held posts of digest feeds
+        for item in get_outbox().due(now):
+            if self._shards and item.feed_id not in self._shards.held:
+                continue
+            if webhook_dispatcher.is_pending((item.feed_id, item.article_id)):
+                continue
+            if get_sent_store().contains(item.feed_id, item.article_id):
+                continue # Delivered since due() was read; its row is on its way out.
+            feed_config = self._feeds.get(item.feed_id)
+            if feed_config is None:
+                continue # Deleted, or not scheduled here (any more); the sync or its new owner deals with it.
+            item.webhook_url = feed_config['webhook_url'] # Follow webhook edits.
+            if feed_config.get('digest') in DIGEST_MODES:
+                digests.setdefault((item.webhook_url, feed_config['digest']), []).append(item)
+                continue
+            print(f"Redelivering post for feed {item.feed_id} (attempt {item.attempts + 1}).")
+            reserve_outbox_fingerprints([item])
+            submit_delivery([item], item.payload)
+
+        for (webhook_url, mode), items in digests.items():
+            reserve_outbox_fingerprints(items)
+            for payload, batch in digest_messages(items, mode):
+                print(f"Posting a digest of {len(batch)} article(s).")
+                submit_delivery(batch, payload)
+
+    def schedule_feed(self, feed_id, due):
+        self._next_due[feed_id] = due
+        heapq.heappush(self._schedule, (due, feed_id))
+
+    def sync_feeds(self, now, startup=False):
+        """
+        Reloads config.json and the feed state records, scheduling new feeds and
+        rescheduling feeds whose settings changed. Feeds that are in flight
+        are left alone; they are rescheduled when they finish. When sharding,
+        only the feeds assigned to this instance are scheduled.
+        """
+        self._config_version = config_cache.version() # Taken first, so a write during the load is seen next time.
+        config = load_config()
+        self._feed_state = load_feed_state() # Updated in place as checks finish.
+        feeds = {feed_config['id']: feed_config for feed_config in config.get("FEEDS", [])
+                 if not self._shards or self._shards.owns(normalize_feed_url(feed_config['url']))}
+
+        for feed_id, feed_config in feeds.items():
+            if feed_id in self._in_flight:
+                continue
+            previous = self._feeds.get(feed_id)
+            if feed_id in self._next_due and previous == feed_config:
+                continue
+
+            state_entry = self._feed_state.get(feed_id, {})
+            last_checked_str = state_entry.get('last_checked')
+            if previous is None and not startup and get_sent_store().shared:
+                # Added while running; a bulk import may have pre-seeded its posted-article history.
+                get_sent_store().refresh_feed(feed_id)
+            if previous and previous['url'] != feed_config['url']:
+                due = now # Re-check straight away after a URL edit (this also un-parks it).
+            elif last_checked_str:
+                due = datetime.fromisoformat(last_checked_str).timestamp() + effective_interval(feed_config, state_entry)
             else:
-                for entry in reversed(recent_entries):
-                    article_id = entry.get('id', entry.link)
-                    post_if_new(article_id, entry, feed_data, feed_config['webhook_url'])
+                due = now
+            if due <= now and startup:
+                # Spread the backlog after a restart instead of firing it all at once.
+                due = now + random.uniform(0, min(feed_config['update_interval'], STARTUP_SPREAD))
+            self.schedule_feed(feed_id, due)
 
-        except Exception as e:
-            print(f"Error processing feed {feed_config['url']}: {e}")
-            status_code = 500
+        for feed_id in set(self._next_due) - set(feeds):
+            del self._next_due[feed_id]
+        # config_cache never hands back an empty or truncated read, so a config
+        # without some feed (or without any) really had them deleted. A missing
+        # file only unschedules everything until it is back.
+        if self._config_version != "missing":
+            configured = {feed_config['id'] for feed_config in config.get("FEEDS", [])}
+            for feed_id in get_outbox().pending_feeds() - configured:
+                get_outbox().forget_feed(feed_id) # Deleted feeds don't post their leftovers.
+            release_deleted_fingerprints(configured)
+            for feed_id in self._configured - configured:
+                # Deleted while running: drop its posted-article IDs and state record too.
+                get_sent_store().forget_feed(feed_id)
+                get_feed_state_store().delete(feed_id)
+                self._feed_state.pop(feed_id, None)
+            self._configured = configured
+        self._feeds = feeds
+        self._feeds_by_url = {}
+        for feed_id, feed_config in feeds.items():
+            self._feeds_by_url.setdefault(normalize_feed_url(feed_config['url']), []).append(feed_id)
+
+    def handle_control_command(self, command):
+        """Answers a command from control.py. Runs in the event loop."""
+        name = command.get('command')
+        if name == "ping":
+            return {"ok": True, "pid": os.getpid(), "feeds": len(self._feeds), "in_flight": len(self._in_flight)}
+        if name == "reload":
+            self.sync_feeds(time.time())
+            self._wake.set() # Newly added feeds are due now.
+            return {"ok": True, "feeds": len(self._feeds)}
+        if name == "check":
+            feed_id = command.get('feed_id')
+            if feed_id not in self._feeds:
+                self.sync_feeds(time.time()) # It may have been added a moment ago.
+            if feed_id not in self._feeds:
+                error = "not assigned to this instance" if self._shards else "unknown feed"
+                return {"ok": False, "error": error}
+            if feed_id in self._in_flight:
+                return {"ok": True, "status": "running"}
+            self.schedule_feed(feed_id, time.time())
+            self._wake.set()
+            return {"ok": True, "status": "queued"}
+        if name == "profile":
+            seconds = float(command.get('seconds') or PROFILE_SECONDS)
+            if not self.profiler.start(seconds):
+                return {"ok": False, "error": "a profile is already running"}
+            return {"ok": True, "seconds": seconds, "output_dir": self.profiler.output_dir}
+        return {"ok": False, "error": f"unknown command {name!r}"}
+
+    def dispatch_feed(self, feed_id):
+        """
+        Starts a check of a due feed. Other feeds with the same URL that are
+        due soon ride along, so the URL is fetched and parsed only once.
+        """
+        if feed_id in self._in_flight:
+            return
+        now = time.time()
+        group = [feed_id]
+        for sibling_id in self._feeds_by_url.get(normalize_feed_url(self._feeds[feed_id]['url']), []):
+            if sibling_id == feed_id or sibling_id in self._in_flight:
+                continue
+            if self._next_due.get(sibling_id, float('inf')) <= now + FANOUT_WINDOW:
+                del self._next_due[sibling_id] # Its heap entry is now stale.
+                group.append(sibling_id)
+
+        if self._shards:
+            acquired = self._shards.acquire(group, now)
+            for member_id in group:
+                if member_id not in acquired:
+                    self.schedule_feed(member_id, now + LEASE_RETRY_DELAY) # The previous owner is still finishing.
+            group = [member_id for member_id in group if member_id in acquired]
+            if not group:
+                return
+            for member_id, previous_owner in acquired.items():
+                if previous_owner != self._shards.instance_id:
+                    # Another instance may have posted for this feed; catch up on its dedup and state records.
+                    get_sent_store().refresh_feed(member_id)
+                    self._feed_state[member_id] = get_feed_state_store().get(member_id)
+            feed_id = group[0]
+
+        subscriptions = []
+        for member_id in group:
+            state_entry = self._feed_state.get(member_id, {})
+            subscriptions.append((self._feeds[member_id], not state_entry.get('last_checked'), state_entry))
+            self._in_flight.add(member_id)
+        print(f"Processing feed: {self._feeds[feed_id]['url']} ({len(group)} subscription(s))")
+        task = asyncio.create_task(self.run_feed_group(subscriptions))
+        self._tasks[task] = (time.time(), subscriptions)
+        task.add_done_callback(lambda done: self._tasks.pop(done, None))
+
+    async def run_feed_group(self, subscriptions):
+        try:
+            states = await self.check_feed_async(subscriptions)
+            for (feed_config, _, _), state in zip(subscriptions, states):
+                self._feed_state[feed_config['id']] = state
         finally:
-            with file_lock:
-                feed_state = load_feed_state()
-                feed_state[feed_config['id']] = {
-                    'last_checked': datetime.now(timezone.utc).isoformat(),
-                    'status_code': status_code
-                }
-                save_feed_state(feed_state)
+            future = self._check_futures.pop(asyncio.current_task(), None)
+            if future is not None and not future.done():
+                # Cancelled by the watchdog while a feed worker still runs the check. The
+                # thread can't be stopped, so the feeds stay in flight until it returns.
+                loop = asyncio.get_running_loop()
+                future.add_done_callback(lambda done: self.call_in_loop(loop, self.finish_stuck_check, subscriptions, done))
+            else:
+                self.finish_feed_group(subscriptions)
+
+    def finish_feed_group(self, subscriptions):
+        for feed_config, _, _ in subscriptions:
+            feed_id = feed_config['id']
+            self._in_flight.discard(feed_id)
+            # Reschedule from the completion time using the current config, if the feed still exists.
+            current = self._feeds.get(feed_id)
+            if current and feed_id not in self._next_due:
+                interval = effective_interval(current, self._feed_state.get(feed_id, {}))
+                self.schedule_feed(feed_id, time.time() + interval * (1 + random.uniform(0, SCHEDULE_JITTER)))
+
+    def finish_stuck_check(self, subscriptions, future):
+        print(f"Reclaimed check of {subscriptions[0][0]['url']} has finished.")
+        if not future.cancelled() and future.exception() is None:
+            for (feed_config, _, _), state in zip(subscriptions, future.result()):
+                self._feed_state[feed_config['id']] = state
+        self.finish_feed_group(subscriptions)
+
+    @staticmethod
+    def call_in_loop(loop, callback, *args):
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass # The loop has stopped; nothing is scheduled any more.
+
+    async def fetch_feed(self, url, request_headers=None):
+        """
+        Downloads a feed, giving up once it exceeds MAX_FEED_BYTES.
+        Returns (content, status_code, headers) with lower-cased header names.
+        """
+        started = time.perf_counter()
+        async with self._session.get(url, headers=request_headers) as response:
+            if (response.content_length or 0) > MAX_FEED_BYTES:
+                raise FeedTooLarge(url)
+            chunks = []
+            size = 0
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                size += len(chunk)
+                if size > MAX_FEED_BYTES:
+                    raise FeedTooLarge(url)
+                chunks.append(chunk)
+            content = b"".join(chunks)
+        FETCH_PHASE_SECONDS.observe(time.perf_counter() - started, phase="download")
+        FETCHES.inc(status=response.status)
+        return content, response.status, {key.lower(): value for key, value in response.headers.items()}
+
+    async def check_feed_async(self, subscriptions):
+        """
+        Fetches a URL once for a list of (feed_config, initial_check, state_entry)
+        subscriptions and processes it for each. Returns their updated state records.
+        """
+        url = subscriptions[0][0]['url']
+        request_headers = {}
+        # Only revalidate if every subscription holds the same validators for its current URL.
+        validators = {(state_entry.get('etag'), state_entry.get('last_modified'))
+                      if state_entry.get('fetched_url') == feed_config['url'] else None
+                      for feed_config, _, state_entry in subscriptions}
+        if len(validators) == 1 and None not in validators:
+            etag, last_modified = validators.pop()
+            if etag:
+                request_headers['If-None-Match'] = etag
+            if last_modified:
+                request_headers['If-Modified-Since'] = last_modified
+
+        # A body stays in memory until its feed has been processed, so downloads
+        # wait here rather than piling up behind busy feed workers.
+        async with self._buffer_semaphore:
+            async with self._fetch_semaphore:
+                started = time.perf_counter()
+                error = None
+                try:
+                    content, status_code, headers = await self.fetch_feed(url, request_headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError, FeedTooLarge) as e:
+                    error = describe_fetch_error(e)
+                    print(f"Error fetching feed {url}: {error}")
+                    FETCHES.inc(status="timeout" if error == FETCH_TIMED_OUT else "error")
+                    content, status_code, headers = None, 500, {}
+                FEED_STAGE_SECONDS.inc(time.perf_counter() - started, feed_id=subscriptions[0][0]['id'], stage="fetch")
+            future = self._executor.submit(self.check_feed_group, subscriptions, content, status_code, headers, error)
+            self._check_futures[asyncio.current_task()] = future
+            return await asyncio.wrap_future(future)
+
+    def check_single_feed(self, feed_config, initial_check=False, content=None, status_code=None, headers=None, state_entry=None):
+        """
+        Parses a feed and posts its new entries. If no content is passed in,
+        the feed is downloaded here (used outside the main loop).
+        Returns the feed's updated state record.
+        """
+        error = None
+        if content is None and status_code is None:
+            try:
+                content, status_code, headers = download_feed(feed_config['url'])
+            except (requests.RequestException, FeedTooLarge) as e:
+                error = describe_fetch_error(e)
+                print(f"Error fetching feed {feed_config['url']}: {error}")
+                content, status_code, headers = None, 500, {}
+        return self.check_feed_group([(feed_config, initial_check, state_entry or {})], content, status_code, headers,
+                                     error)[0]
+
+    def check_feed_group(self, subscriptions, content=None, status_code=None, headers=None, error=None):
+        """
+        Parses a fetched feed at most once and fans its entries out to every
+        subscription. Subscriptions whose last body was identical (or a 304)
+        are skipped. Returns the updated state records in subscription order.
+        """
+        url = subscriptions[0][0]['url']
+        headers = headers or {}
+        feed_data = None
+        content_hash = None
+        if content is not None and status_code < 300:
+            content_hash = hashlib.sha256(content).hexdigest()
+
+        results = {}
+        parse_failure = None
+        for feed_config, initial_check, state_entry in subscriptions:
+            member_status = status_code
+            member_error = error
+            state_update = {}
+            try:
+                if content_hash:
+                    state_update = {
+                        'fetched_url': feed_config['url'],
+                        'etag': headers.get('etag'),
+                        'last_modified': headers.get('last-modified'),
+                        'content_hash': content_hash,
+                    }
+                    unchanged = (state_entry.get('content_hash') == content_hash
+                                 and state_entry.get('fetched_url') == feed_config['url'])
+                    if not unchanged:
+                        if parse_failure:
+                            raise parse_failure # Don't retry a failed parse for every subscription.
+                        if feed_data is None:
+                            response_headers = dict(headers)
+                            response_headers.setdefault('content-location', url)
+                            try:
+                                feed_data = self.parse_content(content, response_headers)
+                            except Exception as e:
+                                parse_failure = e
+                                raise
+                            PARSE_SECONDS.observe(feed_data.parse_seconds)
+                            FEED_STAGE_SECONDS.inc(feed_data.parse_seconds, feed_id=feed_config['id'], stage="parse")
+                        state_update.update(self.process_entries(feed_config, feed_data, initial_check, state_entry))
+            except FutureTimeoutError:
+                print(f"Timed out parsing feed {feed_config['url']}")
+                member_status = 500
+                member_error = PARSE_TIMED_OUT
+                state_update = {} # Keep the old validators and hash so the next poll processes this body.
+            except Exception as e:
+                print(f"Error processing feed {feed_config['url']}: {e}")
+                member_status = 500
+                member_error = repr(e)[:200]
+                state_update = {}
+            results[feed_config['id']] = (feed_config, member_status, member_error, state_update)
+
+        # Only this group's records are written, in one transaction.
+        state_store = get_feed_state_store()
+        checked_at = datetime.now(timezone.utc).isoformat()
+        feed_state = {}
+        for feed_id, (feed_config, member_status, member_error, state_update) in results.items():
+            previous_state = state_store.get(feed_id)
+            state = feed_state[feed_id] = dict(previous_state)
+            state['last_checked'] = checked_at
+            state['status_code'] = member_status
+            state['error'] = member_error
+            if member_error in (FETCH_TIMED_OUT, PARSE_TIMED_OUT):
+                state['timeouts'] = previous_state.get('timeouts', 0) + 1
+            state.update(state_update)
+            for key, value in adapt_interval(feed_config, previous_state, state).items():
+                if value is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+        state_store.upsert_many(feed_state)
+        return [dict(feed_state[feed_config['id']]) for feed_config, _, _ in subscriptions]
+
+    def process_entries(self, feed_config, feed_data, initial_check=False, state_entry=None):
+        """
+        Posts the feed's recent entries that haven't been sent yet.
+        Returns the feed's new high-water mark as a state update.
+        """
+        started = time.perf_counter()
+        scanned = 0
+        try:
+            state_update, scanned = self._process_entries(feed_config, feed_data, initial_check, state_entry or {})
+            return state_update
+        finally:
+            elapsed = time.perf_counter() - started
+            PROCESS_SECONDS.observe(elapsed)
+            FEED_STAGE_SECONDS.inc(elapsed, feed_id=feed_config['id'], stage="process")
+            ENTRIES_SCANNED.inc(scanned, feed_id=feed_config['id'])
+
+    def _process_entries(self, feed_config, feed_data, initial_check, state_entry):
+        if feed_data.bozo:
+            print(f"Warning: Feed {feed_config['url']} may be malformed.")
+
+        # Scan newest-first, whatever order the feed lists its entries in
+        # (undated entries last). Only a feed that lists every entry in date
+        # order can be trusted to have nothing new past the last mark; pinned
+        # or shuffled entries leave the time cutoff to do the skipping.
+        entries = feed_data.entries
+        times = [entry.published for entry in entries]
+        in_date_order = all(times) and (times == sorted(times) or times == sorted(times, reverse=True))
+        entries = newest_first(entries)
+
+        # The high-water mark is the newest entry seen last time and its publish
+        # time. Scanning stops at that entry if the feed is in date order; any
+        # other recent entry is left to the dedup store, however old its date
+        # looks next to the mark (late or backdated entries are still posted).
+        newest_id = state_entry.get('newest_entry_id')
+        newest_time = state_entry.get('newest_entry_time')
+        time_cutoff = time.time() - RECENT_ENTRY_WINDOW
+
+        recent_entries = []
+        scanned = 0
+        for entry in entries:
+            article_id = entry.id
+            if article_id == newest_id and in_date_order and not initial_check:
+                break
+            scanned += 1
+            published_time = entry.published
+            if published_time and published_time > time_cutoff:
+                recent_entries.append((article_id, entry, published_time))
+
+        state_update = {}
+        if entries:
+            state_update['newest_entry_id'] = entries[0].id # The newest by date, or the first listed if none are dated.
+            published_times = [published for _, _, published in recent_entries]
+            if newest_time:
+                published_times.append(newest_time)
+            state_update['newest_entry_time'] = max(published_times) if published_times else None
+
+            # Average time between entries, used by adaptive polling.
+            if len(published_times) > 1:
+                sample = (max(published_times) - min(published_times)) / (len(published_times) - 1)
+                previous_gap = state_entry.get('publish_gap')
+                if previous_gap:
+                    sample = PUBLISH_GAP_SMOOTHING * sample + (1 - PUBLISH_GAP_SMOOTHING) * previous_gap
+                state_update['publish_gap'] = int(sample)
+
+        if initial_check:
+            if recent_entries:
+                article_id, latest_entry, _ = recent_entries[0]
+                post_if_new(feed_config, article_id, latest_entry, feed_data.title)
+
+                # Mark everything else as seen so only future articles get posted.
+                all_recent_ids = [article_id for article_id, _, _ in recent_entries]
+                get_sent_store().add_many(feed_config['id'], all_recent_ids)
+        else:
+            for article_id, entry, _ in reversed(recent_entries):
+                post_if_new(feed_config, article_id, entry, feed_data.title)
+        return state_update, scanned
 
 if __name__ == "__main__":
     initialize_files()
+    get_sent_store()
+    get_outbox()
+    get_fingerprint_filter()
+    if METRICS_PORT:
+        try:
+            start_metrics_server(METRICS_HOST, METRICS_PORT)
+            print(f"Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            # Expected for every instance but the first when several share a host.
+            print(f"Metrics endpoint disabled, port {METRICS_PORT} unavailable: {e}")
     scheduler = FeedScheduler()
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop()) # systemctl stop exits cleanly.
+    if PROFILE_SIGNAL:
+        signal.signal(PROFILE_SIGNAL, lambda signum, frame: scheduler.profiler.start())
     try:
         scheduler.run()
     except KeyboardInterrupt:
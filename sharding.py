@@ -0,0 +1,128 @@
+# sharding.py
+# Splits feeds between several scheduler processes that share one working
+# directory. Live instances are tracked by heartbeats in feed_state.db,
+# each feed URL is assigned to one instance by rendezvous hashing, and an
+# instance must hold a feed's lease before checking it. Leases are only
+# handed over once the old owner has nothing in flight for the feed, so a
+# rebalance never has two instances posting the same feed.
+
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from state_store import FEED_STATE_DB, BUSY_TIMEOUT_MS
+
+# --- Configuration ---
+INSTANCE_TTL = 30 # Seconds without a heartbeat before an instance is considered dead.
+LEASE_TTL = 30 # Seconds a feed lease lasts unless its owner renews it (every heartbeat).
+
+
+def rendezvous_owner(key, instances):
+    """The instance with the highest hash weight for a key; stable as other instances come and go."""
+    return max(instances, key=lambda instance: hashlib.sha1(f"{instance}\n{key}".encode('utf-8')).digest())
+
+
+class ShardCoordinator:
+    """One scheduler instance's view of the shard membership and its feed leases."""
+
+    def __init__(self, path=FEED_STATE_DB, instance_id=None):
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scheduler_instances ("
+            " instance_id TEXT PRIMARY KEY,"
+            " heartbeat REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_leases ("
+            " feed_id TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+        self.live_instances = (self.instance_id,)
+        self.held = set() # feed_ids this instance holds a lease on
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so check-then-write is atomic across processes.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def heartbeat(self, now=None):
+        """
+        Announces this instance, renews its leases and refreshes the list of
+        live instances. Returns True if the membership changed.
+        """
+        now = now or time.time()
+        with self._transaction():
+            self._conn.execute(
+                "INSERT INTO scheduler_instances (instance_id, heartbeat) VALUES (?, ?)"
+                " ON CONFLICT(instance_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (self.instance_id, now),
+            )
+            self._conn.execute("UPDATE feed_leases SET expires = ? WHERE owner = ? AND expires > 0",
+                               (now + LEASE_TTL, self.instance_id))
+            # Leases taken over while this instance was stalled drop out of `held` here.
+            self.held = {row[0] for row in self._conn.execute(
+                "SELECT feed_id FROM feed_leases WHERE owner = ? AND expires > 0", (self.instance_id,))}
+            self._conn.execute("DELETE FROM scheduler_instances WHERE heartbeat < ?", (now - 10 * INSTANCE_TTL,))
+            rows = self._conn.execute("SELECT instance_id FROM scheduler_instances WHERE heartbeat >= ?",
+                                      (now - INSTANCE_TTL,)).fetchall()
+        live = tuple(sorted({row[0] for row in rows} | {self.instance_id}))
+        changed = live != self.live_instances
+        if changed:
+            print(f"Shard {self.instance_id}: {len(live)} scheduler instance(s) live.")
+        self.live_instances = live
+        return changed
+
+    def owns(self, key):
+        return rendezvous_owner(key, self.live_instances) == self.instance_id
+
+    def acquire(self, feed_ids, now=None):
+        """
+        Takes (or renews) the leases for feed_ids that are free, expired or
+        already ours. Returns {feed_id: previous_owner} for the ones acquired;
+        previous_owner is None for a feed that never had a lease.
+        """
+        now = now or time.time()
+        acquired = {}
+        with self._transaction():
+            for feed_id in feed_ids:
+                row = self._conn.execute("SELECT owner, expires FROM feed_leases WHERE feed_id = ?", (feed_id,)).fetchone()
+                if row and row[0] != self.instance_id and row[1] >= now:
+                    continue
+                self._conn.execute(
+                    "INSERT INTO feed_leases (feed_id, owner, expires) VALUES (?, ?, ?)"
+                    " ON CONFLICT(feed_id) DO UPDATE SET owner = excluded.owner, expires = excluded.expires",
+                    (feed_id, self.instance_id, now + LEASE_TTL),
+                )
+                acquired[feed_id] = row[0] if row else None
+        self.held.update(acquired)
+        return acquired
+
+    def release(self, feed_ids):
+        """Gives up leases. The owner is kept so the next holder knows the feed changed hands."""
+        feed_ids = [feed_id for feed_id in feed_ids if feed_id in self.held]
+        if not feed_ids:
+            return
+        with self._transaction():
+            self._conn.executemany("UPDATE feed_leases SET expires = 0 WHERE feed_id = ? AND owner = ?",
+                                   [(feed_id, self.instance_id) for feed_id in feed_ids])
+        self.held.difference_update(feed_ids)
+
+    def leave(self):
+        """Releases everything and deregisters, so the other instances rebalance straight away."""
+        self.release(list(self.held))
+        with self._transaction():
+            self._conn.execute("DELETE FROM scheduler_instances WHERE instance_id = ?", (self.instance_id,))
+        self._conn.close()
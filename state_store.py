@@ -0,0 +1,208 @@
+# state_store.py
+# Per-feed state records (last check, status, validators, polling data) in
+# SQLite. WAL mode lets the web UI read while the scheduler writes, each
+# check upserts only its own rows, and several processes can write safely.
+
+import json
+import os
+import sqlite3
+import threading
+from metrics import STATE_WRITE_SECONDS
+
+# --- Configuration ---
+FEED_STATE_DB = "feed_state.db"
+LEGACY_FEED_STATE_FILE = "feed_state.json" # Imported automatically on first start.
+BUSY_TIMEOUT_MS = 10000 # How long a writer waits for another process's write to finish.
+
+
+def thread_connection(local, path):
+    """
+    The calling thread's connection to the database at `path`, kept in the
+    threading.local `local`. One per thread and per process (connections
+    must not cross a fork).
+    """
+    conn = getattr(local, 'conn', None)
+    if conn is None or local.pid != os.getpid():
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+        local.pid = os.getpid()
+    return conn
+
+
+class FeedStateStore:
+    """
+    Every write bumps a global revision number, so readers can cheaply ask
+    "what changed since revision N" instead of reloading every record. The
+    number only ever grows; a deleted record leaves a tombstone (state
+    "null") at a new revision, so readers drop it too.
+    """
+
+    def __init__(self, path=FEED_STATE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot = {}
+        self._snapshot_revision = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_state ("
+            " feed_id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " revision INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS feed_state_revision ON feed_state (revision)")
+        conn.execute("CREATE TABLE IF NOT EXISTS feed_state_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO feed_state_meta (key, value)"
+                     " SELECT 'revision', COALESCE(MAX(revision), 0) FROM feed_state")
+        self._migrate_legacy_file()
+
+    def _conn(self):
+        return thread_connection(self._local, self.path)
+
+    # --- Reads ---
+
+    def get(self, feed_id):
+        row = self._conn().execute("SELECT state FROM feed_state WHERE feed_id = ?", (feed_id,)).fetchone()
+        return (json.loads(row[0]) if row else None) or {}
+
+    def get_all(self):
+        rows = self._conn().execute("SELECT feed_id, state FROM feed_state WHERE state != 'null'").fetchall()
+        return {feed_id: json.loads(state) for feed_id, state in rows}
+
+    def revision(self):
+        return self._conn().execute("SELECT value FROM feed_state_meta WHERE key = 'revision'").fetchone()[0]
+
+    def changes_since(self, revision):
+        """
+        Returns (latest_revision, {feed_id: state}) for records written after
+        `revision`. Deleted records come back with a state of None.
+        """
+        rows = self._conn().execute(
+            "SELECT feed_id, state, revision FROM feed_state WHERE revision > ? ORDER BY revision", (revision,)
+        ).fetchall()
+        latest = rows[-1][2] if rows else revision
+        return latest, {feed_id: json.loads(state) for feed_id, state, _ in rows}
+
+    def snapshot(self):
+        """
+        All records, kept in memory and refreshed incrementally from the
+        revision index. The returned dict is shared; treat it as read-only.
+        """
+        with self._snapshot_lock:
+            latest, changed = self.changes_since(self._snapshot_revision)
+            if changed:
+                snapshot = dict(self._snapshot)
+                for feed_id, state in changed.items():
+                    if state is None:
+                        snapshot.pop(feed_id, None)
+                    else:
+                        snapshot[feed_id] = state
+                self._snapshot = snapshot
+            self._snapshot_revision = latest
+            return self._snapshot
+
+    # --- Writes ---
+
+    def _take_revisions(self, conn, count):
+        """Reserves `count` new revision numbers; returns the first. Call inside a write transaction."""
+        conn.execute("UPDATE feed_state_meta SET value = value + ? WHERE key = 'revision'", (count,))
+        return self.revision() - count + 1
+
+    def upsert_many(self, states):
+        """Writes whole records for several feeds in one transaction."""
+        if not states:
+            return
+        conn = self._conn()
+        with STATE_WRITE_SECONDS.time():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                revision = self._take_revisions(conn, len(states))
+                conn.executemany(
+                    "INSERT INTO feed_state (feed_id, state, revision) VALUES (?, ?, ?)"
+                    " ON CONFLICT(feed_id) DO UPDATE SET state = excluded.state, revision = excluded.revision",
+                    [(feed_id, json.dumps(state), revision + i) for i, (feed_id, state) in enumerate(states.items())],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def update(self, feed_id, **fields):
+        """Read-modify-write of a single record, atomic across processes."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM feed_state WHERE feed_id = ?", (feed_id,)).fetchone()
+            state = (json.loads(row[0]) if row else None) or {}
+            state.update(fields)
+            revision = self._take_revisions(conn, 1)
+            conn.execute(
+                "INSERT INTO feed_state (feed_id, state, revision) VALUES (?, ?, ?)"
+                " ON CONFLICT(feed_id) DO UPDATE SET state = excluded.state, revision = excluded.revision",
+                (feed_id, json.dumps(state), revision),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return state
+
+    def delete(self, feed_id):
+        """Replaces a record with a tombstone, so incremental readers drop it too."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM feed_state WHERE feed_id = ? AND state != 'null'", (feed_id,)).fetchone():
+                conn.execute("UPDATE feed_state SET state = 'null', revision = ? WHERE feed_id = ?",
+                             (self._take_revisions(conn, 1), feed_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_legacy_file(self):
+        """Imports feed_state.json once, then renames it."""
+        if not os.path.exists(LEGACY_FEED_STATE_FILE):
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-check inside the write lock in case another process migrated it first.
+            if not os.path.exists(LEGACY_FEED_STATE_FILE):
+                conn.execute("ROLLBACK")
+                return
+            try:
+                with open(LEGACY_FEED_STATE_FILE, 'r') as f:
+                    content = f.read()
+                legacy_state = json.loads(content) if content else {}
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Could not migrate {LEGACY_FEED_STATE_FILE}: {e}")
+                conn.execute("ROLLBACK")
+                return
+            revision = self._take_revisions(conn, len(legacy_state))
+            conn.executemany(
+                "INSERT OR IGNORE INTO feed_state (feed_id, state, revision) VALUES (?, ?, ?)",
+                [(feed_id, json.dumps(state), revision + i) for i, (feed_id, state) in enumerate(legacy_state.items())],
+            )
+            os.replace(LEGACY_FEED_STATE_FILE, LEGACY_FEED_STATE_FILE + ".migrated")
+            conn.execute("COMMIT")
+            print(f"Migrated {len(legacy_state)} feed state records from {LEGACY_FEED_STATE_FILE}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# --- Shared Instance ---
+_store = None
+_store_lock = threading.Lock()
+
+def get_feed_state_store():
+    """The process-wide store, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeedStateStore()
+        return _store
@@ -0,0 +1,63 @@
+# test_process_entries.py
+# High-water mark handling in FeedScheduler._process_entries for feeds whose
+# entries aren't listed in date order.
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler
+from feed_parser import FeedEntry, ParsedFeed
+
+
+def entry(id, minutes_ago):
+    return FeedEntry(id, f"https://example.com/{id}", f"Entry {id}", "", time.time() - minutes_ago * 60)
+
+
+class ProcessEntriesTest(unittest.TestCase):
+    def process(self, entries, state_entry, sent=()):
+        """Runs one poll. Returns the IDs that would be posted (not already in `sent`) and the state update."""
+        posted = []
+        def post_if_new(feed_config, article_id, *args):
+            if article_id not in sent:
+                posted.append(article_id)
+        feed_config = {'id': 'f1', 'url': 'https://example.com/feed', 'webhook_url': 'https://example.com/hook'}
+        with mock.patch.object(scheduler, 'post_if_new', post_if_new):
+            state_update, _ = scheduler.FeedScheduler()._process_entries(
+                feed_config, ParsedFeed("Feed", False, entries), False, state_entry)
+        return posted, state_update
+
+    def test_pinned_entry_does_not_hide_new_entries(self):
+        a, b = entry("a", 10), entry("b", 1)
+        state_entry = {'newest_entry_id': "a", 'newest_entry_time': a.published}
+        posted, state_update = self.process([entry("pinned", 60), b, a], state_entry, sent={"a", "pinned"})
+        self.assertEqual(posted, ["b"])
+        self.assertEqual(state_update['newest_entry_id'], "b")
+
+    def test_mark_is_newest_entry_when_shuffled(self):
+        state_entry = {'newest_entry_id': "old", 'newest_entry_time': time.time() - 3600}
+        posted, state_update = self.process([entry("c", 5), entry("d", 1), entry("e", 3)], state_entry)
+        self.assertEqual(posted, ["c", "e", "d"]) # Posted oldest first.
+        self.assertEqual(state_update['newest_entry_id'], "d")
+
+    def test_date_ordered_feed_stops_at_mark(self):
+        state_entry = {'newest_entry_id': "a", 'newest_entry_time': time.time() - 600}
+        posted, state_update = self.process([entry("a", 10), entry("b", 1)], state_entry)
+        self.assertEqual(posted, ["b"])
+        self.assertEqual(state_update['newest_entry_id'], "b")
+
+    def test_backdated_entry_is_still_posted(self):
+        a = entry("a", 5)
+        state_entry = {'newest_entry_id': "a", 'newest_entry_time': a.published}
+        # Listed on top of a newest-first feed, with a date two hours back.
+        posted, state_update = self.process([entry("late", 120), a, entry("b", 30)], state_entry, sent={"a", "b"})
+        self.assertEqual(posted, ["late"])
+        self.assertEqual(state_update['newest_entry_id'], "a")
+
+
+if __name__ == "__main__":
+    unittest.main()